@@ -0,0 +1,83 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from stock_io import list_stock_files, store_is_fresh
+
+# --- 配置 ---
+STOCK_DATA_DIR = 'stock_data'  # 股票 CSV 数据目录 (update.py 的输出)
+STORE_PATH = os.path.join('stock_store', 'stock_data.parquet')  # 列式存储文件
+# 每只股票只保留最近 STORE_ROWS 个交易日，需不小于各筛选脚本读取的行数 (核心筛选为 400)
+STORE_ROWS = 500
+
+DATE_COL = '日期'
+NUMERIC_COLS = ['开盘', '收盘', '最高', '最低', '成交量']
+
+# 数值列按 float64 存储，与 CSV 中的值完全一致 (部分筛选脚本会原样输出价格和成交量)；
+# 需要 float32 的脚本在读取后自行转换
+COLUMN_TYPES = {DATE_COL: pa.string(), **{col: pa.float64() for col in NUMERIC_COLS}}
+SCHEMA = pa.schema([('code', pa.string())] + list(COLUMN_TYPES.items()))
+
+def read_stock_table(file_path):
+    """读取单个股票 CSV 的最近 STORE_ROWS 行，并加上 code 列；读取失败时打印原因并返回 None"""
+    try:
+        table = pacsv.read_csv(
+            file_path,
+            read_options=pacsv.ReadOptions(use_threads=False),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=[DATE_COL] + NUMERIC_COLS,
+                column_types=COLUMN_TYPES,
+            ),
+        )
+    except Exception as e:
+        print(f"跳过 {file_path}: {e}")
+        return None
+
+    table = table.sort_by(DATE_COL).slice(max(0, table.num_rows - STORE_ROWS))
+    code = os.path.basename(file_path).split('.')[0]
+    table = table.add_column(0, 'code', pa.array([code] * table.num_rows, pa.string()))
+    return table.select(SCHEMA.names).cast(SCHEMA)
+
+def ensure_store(csv_files):
+    """
+    存储缺失或早于某个 CSV 文件时重新生成 (CSV 只在有新 K 线时才会变化，
+    之后的每次扫描都可直接读取存储)。csv_files 为 stock_io.list_stock_files 的结果，返回存储是否可用。
+    """
+    if not store_is_fresh(STORE_PATH, csv_files):
+        main()
+    return store_is_fresh(STORE_PATH, csv_files)
+
+def main():
+    start_time = time.time()
+
+    all_files = [path for path, _ in list_stock_files(STOCK_DATA_DIR)]
+    if not all_files:
+        print(f"未找到 {STOCK_DATA_DIR} 目录下的 CSV 文件。")
+        return
+
+    print(f"开始转换 {len(all_files)} 个股票文件...")
+    max_workers = os.cpu_count() or 4
+    chunksize = max(1, len(all_files) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        tables = [t for t in executor.map(read_stock_table, all_files, chunksize=chunksize) if t is not None]
+
+    skipped = len(all_files) - len(tables)
+    if skipped:
+        print(f"警告: {skipped} 个文件读取失败，未写入存储。")
+    # 全部读取失败时仍写入空存储，使其不早于各 CSV，避免之后每次扫描都重复完整重建
+    table = pa.concat_tables(tables) if tables else SCHEMA.empty_table()
+
+    # 各股票的行按 code、日期升序连续存放，读取方可直接按 code 切分
+    os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+    tmp_path = STORE_PATH + '.tmp'
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, STORE_PATH)
+
+    print(f"已写入 {len(tables)} 只股票到 {STORE_PATH}，耗时 {time.time() - start_time:.2f} 秒。")
+
+if __name__ == '__main__':
+    main()
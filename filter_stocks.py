@@ -1,11 +1,15 @@
+import numpy as np
 import pandas as pd
 import glob
+import io
 import os
 import time
 from datetime import datetime
 import multiprocessing as mp
 import pytz
 
+from stock_io import read_tail_bytes
+
 # --- 筛选逻辑参数：已收紧条件 ---
 DAYS_LOOKBACK = 15     # 寻找低点和拉升的周期 (略微缩短，确保拉升更近)
 MIN_GAIN_PERCENT = 50.0  # N天内最低价到最高价的最小涨幅百分比 (提高到 50%)
@@ -17,36 +21,39 @@ LATEST_CLOSE_MIN = 5.0      # 最新收盘价不能低于 5.0 元
 AVG_AMOUNT_MIN = 10000000.0 # 最近 N 天平均成交额不能低于 1000 万
 # --------------------------------------------------------
 
+# --- CSV 读取参数 (模块级常量，避免每个文件重新构造) ---
+# 根据实际文件片段定义 12 列名称，跳过标题行
+_COLUMN_NAMES = [
+    'date', 'code_file', 'open', 'close', 'high', 'low',
+    'volume', 'amount', 'amplitude', 'pct_chg', 'chg', 'turnover'
+]
+# 只读取筛选用到的列 (行已按日期升序存放，无需读取日期列)
+_USECOLS = ['close', 'high', 'low', 'amount']
+# 数值列均参与阈值比较 (成交额可达 1e10，float32 只有约 7 位有效数字)，按 float64 解析
+_DTYPES = {col: np.float64 for col in _USECOLS}
+
 # 定义处理单个CSV文件的函数
 def process_file(file_path):
     """
     处理单个CSV文件，筛选符合快速拉升后回落条件的股票。
     """
     try:
-        # 根据实际文件片段定义 12 列名称，跳过标题行
-        column_names = [
-            'date', 'code_file', 'open', 'close', 'high', 'low', 
-            'volume', 'amount', 'amplitude', 'pct_chg', 'chg', 'turnover'
-        ]
-        
-        # 1. 准确读取数据：使用 date_format 加速解析并消除警告
+        # 1. 筛选只用到最近 DAYS_LOOKBACK 天，只解析文件尾部这几行的所需列，数值列按 float64 解析
         df = pd.read_csv(
-            file_path, 
+            io.BytesIO(read_tail_bytes(file_path, DAYS_LOOKBACK)),
             header=None,
             skiprows=1,  # 跳过实际的标题行
-            names=column_names,
-            dtype={'code_file': str}, 
-            parse_dates=['date'], 
-            date_format='%Y-%m-%d' # 明确指定日期格式，优化性能
+            names=_COLUMN_NAMES,
+            usecols=_USECOLS,
+            dtype=_DTYPES,
+            engine='c',
         )
         
-        # 确保数据按日期降序排列
-        df = df.sort_values(by='date', ascending=False).reset_index(drop=True)
-        
         if len(df) < DAYS_LOOKBACK:
             return None # 数据不足
 
-        recent_data = df.head(DAYS_LOOKBACK)
+        # update.py 按日期升序追加写入，直接取最后 N 行并倒序 (最新在前)，无需对整表排序
+        recent_data = df.iloc[:-DAYS_LOOKBACK - 1:-1]
         stock_code = os.path.basename(file_path).split('.')[0]
         
         # 2. 【附加过滤】排除低流动性和低价股
@@ -6,6 +6,12 @@ from multiprocessing import Pool, cpu_count
 from datetime import datetime
 import pytz
 
+# pyarrow 可用时使用其 C++ CSV 解析器读取单个股票文件，否则退回 pd.read_csv
+try:
+    import pyarrow.csv as pacsv
+except ImportError:
+    pacsv = None
+
 # --- 配置 ---
 STOCK_DATA_DIR = 'stock_data'
 STOCK_NAMES_FILE = 'stock_names.csv'
@@ -34,7 +40,7 @@ def load_stock_names(filepath):
     try:
         # 假设 stock_names.csv 包含 'code' 和 'name' 列
         df = pd.read_csv(filepath, dtype={'code': str})
-        df['code'] = df['code'].apply(lambda x: x.zfill(6))
+        df['code'] = df['code'].str.zfill(6)
         
         # 将代码和名称作为字典返回，用于后续匹配
         names_dict = df.set_index('code')['name'].to_dict()
@@ -73,22 +79,23 @@ def check_exclusions(stock_code, stock_name):
 
     return False, "" # 保留
 
-def process_file(file_path, stock_names_dict):
+def read_stock_csv(file_path):
+    """读取单个股票文件，pyarrow 可用时使用其 CSV 解析器"""
+    if pacsv is None:
+        return pd.read_csv(file_path, engine='python')
+    # 外层已按文件并行，单个文件内不再开线程
+    return pacsv.read_csv(file_path, read_options=pacsv.ReadOptions(use_threads=False)).to_pandas()
+
+def process_file(file_path):
     """
     处理单个 CSV 文件，筛选符合条件的股票。
     """
     try:
         basename = os.path.basename(file_path)
         stock_code = os.path.splitext(basename)[0].zfill(6)
-        stock_name = stock_names_dict.get(stock_code, '未知名称')
 
-        # --- 0. 排除股票类型检查 ---
-        should_exclude, reason = check_exclusions(stock_code, stock_name)
-        if should_exclude:
-            # logging.debug(f"Code {stock_code} excluded: {reason}") # 调试时可开启
-            return None
-        
-        df = pd.read_csv(file_path, engine='python')
+        # 排除股票类型检查已在主进程中对文件列表统一完成
+        df = read_stock_csv(file_path)
 
         if df.empty:
             return None
@@ -156,15 +163,23 @@ def main():
         logging.error(f"在目录 {STOCK_DATA_DIR} 中未找到任何 CSV 文件。")
         return
 
-    logging.info(f"找到 {len(all_files)} 个数据文件，开始并行处理...")
+    # --- 排除股票类型检查 ---
+    # 在主进程中对每个代码只检查一次，得到保留的代码集合，
+    # 被排除的文件不再分发给工作进程，工作进程也无需股票名称
+    codes = {f: os.path.splitext(os.path.basename(f))[0].zfill(6) for f in all_files}
+    valid_codes = set()
+    for code in set(codes.values()):
+        stock_name = stock_names_dict.get(code, '未知名称')
+        # 名称缺失 (非字符串) 的代码无法判断是否为 ST，与原先一样视为排除
+        if isinstance(stock_name, str) and not check_exclusions(code, stock_name)[0]:
+            valid_codes.add(code)
+    valid_files = [f for f in all_files if codes[f] in valid_codes]
+
+    logging.info(f"找到 {len(all_files)} 个数据文件，排除后剩余 {len(valid_files)} 个，开始并行处理...")
 
     # 3. 使用多进程并行处理
-    # 传递 stock_names_dict 给 process_file 函数
-    process_args = [(f, stock_names_dict) for f in all_files]
-    
     with Pool(cpu_count()) as pool:
-        # pool.starmap 用于传递多个参数
-        results = pool.starmap(process_file, process_args)
+        results = pool.map(process_file, valid_files)
 
     # 4. 收集和整理结果
     filtered_codes = [code for code in results if code is not None]
@@ -1,10 +1,14 @@
 import pandas as pd
+import numpy as np
+import csv
+import io
 import os
-import glob
 from datetime import datetime
-from multiprocessing import Pool, cpu_count
+from concurrent.futures import ThreadPoolExecutor
 import pytz
 
+from stock_io import list_stock_files, read_tail_bytes
+
 # --- 配置 ---
 STOCK_DATA_DIR = 'stock_data'
 STOCK_NAMES_FILE = 'stock_names.csv'
@@ -13,9 +17,15 @@ MIN_CLOSING_PRICE = 5.0
 MAX_CLOSING_PRICE = 20.0
 # 使用上海时区（与北京时间一致）
 TIMEZONE = pytz.timezone('Asia/Shanghai')
+# 每个文件只解析最后几行，工作量以 IO 为主，使用线程池即可，无需启动子进程
+MAX_WORKERS = min(32, (os.cpu_count() or 4) * 2)
 
-# 定义一个全局变量来存储股票名称映射，供子进程使用
+# 定义一个全局变量来存储股票名称映射，供工作线程使用
 GLOBAL_STOCK_NAMES = None 
+# 名称中含 ST 的股票代码集合 (加载名称时一次性计算，不再逐文件 upper())
+GLOBAL_ST_CODES = frozenset()
+# 排除的代码前缀 (创业板)
+EXCLUDED_PREFIXES = frozenset(('30',))
 
 # 修复：将 CSV 中的列名定义为常量
 DATE_COL = '日期'
@@ -24,135 +34,131 @@ OPEN_COL = '开盘'
 CLOSE_COL = '收盘'
 HIGH_COL = '最高'
 LOW_COL = '最低'
+# 只读取形态判断需要的列，价格列直接按 float64 解析
+PRICE_COLS = [OPEN_COL, CLOSE_COL, HIGH_COL, LOW_COL]
+# 形态只看最近 4 根 K 线，每个文件只读取最后 TAIL_ROWS 行；
+# 与原实现一样不剔除含缺失值的行，最后 4 行即参与判断的 K 线，多读的几行不影响结果
+TAIL_ROWS = 10
+# 结果文件的列顺序
+OUTPUT_COLS = ['Code', 'Name', 'Close', 'Date']
 
 
 def load_stock_names(file_path):
-    """加载股票代码和名称的映射表"""
+    """
+    加载股票代码和名称的映射表。
+    stock_names.csv 首行为表头 (Code,Name 或 code,name)，前两列依次为代码和名称；
+    只需构建一个字典，用 csv.reader 逐行读取即可，代码统一补齐为 6 位字符串。
+    """
     try:
-        # 假设 stock_names.csv 格式为 code,name
-        names_df = pd.read_csv(file_path, dtype={'Code': str})
-        
-        # 兼容性检查：如果文件头是小写的 code,name
-        if 'Code' not in names_df.columns and 'code' in names_df.columns:
-             names_df.rename(columns={'code': 'Code', 'name': 'Name'}, inplace=True)
-        
-        if 'Code' not in names_df.columns or 'Name' not in names_df.columns:
-            # 尝试自动修正列名
-            print("Warning: stock_names.csv columns might not be 'Code', 'Name'. Assuming first two columns.")
-            # 假设第一个是 Code，第二个是 Name
-            names_df.columns = ['Code', 'Name'] + list(names_df.columns[2:])
-
-        return names_df.set_index('Code')['Name'].to_dict()
+        with open(file_path, encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # 跳过表头
+            return {row[0].strip().zfill(6): row[1] for row in reader if len(row) >= 2}
     except Exception as e:
         print(f"Error loading stock names: {e}") 
         return {}
         
-def initializer(stock_names_dict):
+def find_st_codes(stock_names_dict):
+    """返回名称中含 ST (不区分大小写，*ST 亦包含在内) 的股票代码集合"""
+    return frozenset(code for code, name in stock_names_dict.items()
+                     if isinstance(name, str) and "ST" in name.upper())
+
+def set_stock_names(stock_names_dict, st_codes):
     """
-    Pool 初始化函数，将股票名称字典加载到每个子进程的全局变量中。
+    将股票名称字典和 ST 代码集合保存到全局变量中，供各工作线程共享 (无需复制)。
     """
-    global GLOBAL_STOCK_NAMES
+    global GLOBAL_STOCK_NAMES, GLOBAL_ST_CODES
     GLOBAL_STOCK_NAMES = stock_names_dict
+    GLOBAL_ST_CODES = st_codes
 
-def check_stock_filters(code: str, name: str, close_price: float) -> bool:
+def is_valid_stock(code: str) -> bool:
     """
-    检查股票代码、名称和价格是否符合筛选要求。
+    检查股票代码是否符合筛选要求 (排除 ST 股和创业板)，只依赖代码，可在读取文件前调用。
     """
-    
-    # --- 1. 价格筛选 ---
-    if not (MIN_CLOSING_PRICE <= close_price <= MAX_CLOSING_PRICE):
-        return False
-
-    # --- 2. 排除 ST 股 ---
-    # 使用 name.upper() 进行不区分大小写的匹配
-    if isinstance(name, str) and ("ST" in name.upper() or "*ST" in name.upper()):
-        return False
-        
-    # --- 3. 排除创业板 (30开头) ---
-    if code.startswith('30'):
-        return False
-        
-    return True
+    return code[:2] not in EXCLUDED_PREFIXES and code not in GLOBAL_ST_CODES
 
 
-def check_shovel_bottom(df: pd.DataFrame) -> bool:
+def check_shovel_bottom(arr: np.ndarray) -> bool:
     """
     检查“铲底形态”筛选条件 (基于图片中的四根K线结构)。
+    arr 为按日期降序排列的 K 线数组，列顺序同 PRICE_COLS (开/收/高/低)。
     """
-    if len(df) < 4:
+    if len(arr) < 4:
         return False
     
     # C1=最新, C2=次新, C3=第三新, C4=第四新
-    c1, c2, c3, c4 = df.iloc[0], df.iloc[1], df.iloc[2], df.iloc[3]
+    # 最近 4 根 K 线的开/收/高/低数组 (下标 0..3 对应 C1..C4)
+    o, c, h, l = arr[:4].T
+    body = np.abs(c - o)
+    body_ratio = body / (h - l + 1e-6)
     
     # 1. C4（最老）：大阴线 (Close < Open)，实体较大
-    is_c4_bearish = c4[CLOSE_COL] < c4[OPEN_COL]
-    c4_body_ratio = abs(c4[CLOSE_COL] - c4[OPEN_COL]) / (c4[HIGH_COL] - c4[LOW_COL] + 1e-6)
-    is_c4_large_body = c4_body_ratio > 0.5 and abs(c4[CLOSE_COL] - c4[OPEN_COL]) > (c4[OPEN_COL] * 0.01)
+    is_c4_bearish = c[3] < o[3]
+    is_c4_large_body = body_ratio[3] > 0.5 and body[3] > (o[3] * 0.01)
     
     # 2. C3（次老）：小实体 K 线，体现止跌
-    c3_body_ratio = abs(c3[CLOSE_COL] - c3[OPEN_COL]) / (c3[HIGH_COL] - c3[LOW_COL] + 1e-6)
-    is_c3_small_body = c3_body_ratio < 0.4
+    is_c3_small_body = body_ratio[2] < 0.4
     
     # 3. C2（第三新）：大阳线 (Close > Open)，实体较大，收盘价高于 C3 的高点
-    is_c2_bullish = c2[CLOSE_COL] > c2[OPEN_COL]
-    c2_body_ratio = abs(c2[CLOSE_COL] - c2[OPEN_COL]) / (c2[HIGH_COL] - c2[LOW_COL] + 1e-6)
-    is_c2_large_body = c2_body_ratio > 0.5 and abs(c2[CLOSE_COL] - c2[OPEN_COL]) > (c2[OPEN_COL] * 0.015)
-    is_c2_higher_than_c3 = c2[CLOSE_COL] > c3[HIGH_COL]
+    is_c2_bullish = c[1] > o[1]
+    is_c2_large_body = body_ratio[1] > 0.5 and body[1] > (o[1] * 0.015)
+    is_c2_higher_than_c3 = c[1] > h[2]
     
     # 4. C1 (最新): 整理/回调，收盘价高于 C2 的开盘价（维持强势）
-    is_c1_stable = c1[CLOSE_COL] > c2[OPEN_COL] 
+    is_c1_stable = c[0] > o[1] 
     
     # 5. 底部确认：C4, C3, C2 的低点在相似水平，形成底部区域
-    lows = [c4[LOW_COL], c3[LOW_COL], c2[LOW_COL]]
-    low_range = max(lows) - min(lows)
-    is_bottom_area = low_range < (c4[CLOSE_COL] * 0.02)
-    
-    # 综合判断
-    if (is_c4_bearish and is_c4_large_body and 
-        is_c3_small_body and 
-        is_c2_bullish and is_c2_large_body and is_c2_higher_than_c3 and
-        is_c1_stable and
-        is_bottom_area):
-        return True
-        
-    return False
-
-def process_file(file_path):
+    lows = l[1:4]
+    low_range = lows.max() - lows.min()
+    is_bottom_area = low_range < (c[3] * 0.02)
+    
+    # 综合判断：所有条件一次性归约，避免逐条分支
+    checks = np.array([is_c4_bearish, is_c4_large_body,
+                       is_c3_small_body,
+                       is_c2_bullish, is_c2_large_body, is_c2_higher_than_c3,
+                       is_c1_stable,
+                       is_bottom_area])
+    return bool(checks.all())
+
+def process_file(file_path, *, _min_close=MIN_CLOSING_PRICE, _max_close=MAX_CLOSING_PRICE):
     """
     处理单个 CSV 文件，检查形态条件和股票筛选条件。
+    价格区间在定义时绑定为默认参数，逐文件调用时按局部变量读取，不再查找模块全局变量。
     """
     stock_code = os.path.basename(file_path).replace('.csv', '')
     
-    # 从子进程的全局变量中获取名称
+    # 从全局变量中获取名称
     stock_name = GLOBAL_STOCK_NAMES.get(stock_code, 'N/A')
+
+    # --- 1. 先做代码/名称筛选 (ST、创业板)，不符合的文件无需读取 ---
+    if not is_valid_stock(stock_code):
+        return None
     
     try:
         # 修复：将 'Date' 替换为 '日期'
-        df = pd.read_csv(file_path, parse_dates=[DATE_COL]) 
+        df = pd.read_csv(io.BytesIO(read_tail_bytes(file_path, TAIL_ROWS)),
+                         usecols=[DATE_COL] + PRICE_COLS, parse_dates=[DATE_COL],
+                         dtype={col: np.float64 for col in PRICE_COLS}, engine='c')
         
-        # 确保数据按日期降序排列 (最新数据在前面)
-        df = df.sort_values(by=DATE_COL, ascending=False).reset_index(drop=True)
+        # update.py 按日期升序追加写入，最后 4 行倒序即按日期降序的最近 4 根 K 线 (最新数据在前面)
+        recent = df.iloc[:-5:-1]
         
-        if df.empty:
+        if recent.empty:
             return None
 
-        latest_close = df.iloc[0][CLOSE_COL]
-        # 修复：使用正确的日期列名进行格式化
-        latest_date = df.iloc[0][DATE_COL].strftime('%Y-%m-%d') 
-        
-        # --- 1. 首先进行股票基础筛选 (价格、ST、创业板) ---
-        if not check_stock_filters(stock_code, stock_name, latest_close):
+        # --- 价格筛选：最便宜且淘汰率最高，先只取最新收盘价一个标量判断 ---
+        latest_close = recent[CLOSE_COL].iat[0]
+        if not (_min_close <= latest_close <= _max_close):
             return None
         
         # --- 2. 然后进行技术形态筛选 ---
-        if check_shovel_bottom(df):
-            return {
-                'Code': stock_code, 
-                'Name': stock_name,
-                'Date': latest_date, 
-                'Close': latest_close
-            }
+        # 一次性转为 NumPy 数组，后续判断不再逐行访问 pandas 标量
+        arr = recent[PRICE_COLS].to_numpy()
+        if check_shovel_bottom(arr):
+            # 修复：使用正确的日期列名进行格式化 (仅对命中的股票格式化日期)
+            latest_date = recent[DATE_COL].iat[0].strftime('%Y-%m-%d')
+            # 按 OUTPUT_COLS 顺序返回元组
+            return (stock_code, stock_name, latest_close, latest_date)
         
     except KeyError as e:
         # 处理可能的列名错误，但由于我们已修正，这更多是数据文件格式不统一时使用
@@ -171,31 +177,25 @@ def main():
     stock_names = load_stock_names(STOCK_NAMES_FILE)
     
     # 2. 扫描所有数据文件
-    file_paths = glob.glob(os.path.join(STOCK_DATA_DIR, '*.csv'))
+    # 按文件名 (股票代码) 排序后顺序读取
+    file_paths = [path for path, _ in list_stock_files(STOCK_DATA_DIR)]
     if not file_paths:
         print(f"No CSV files found in directory: {STOCK_DATA_DIR}")
         return
 
-    print(f"Found {len(file_paths)} stock data files. Using {cpu_count()} cores for parallelism.")
+    print(f"Found {len(file_paths)} stock data files. Using {MAX_WORKERS} threads for parallelism.")
 
-    # 3. 使用多进程并行处理
-    with Pool(initializer=initializer, initargs=(stock_names,)) as pool:
-        results = pool.map(process_file, file_paths)
-    
-    # 4. 过滤有效结果
-    matched_stocks = [r for r in results if r is not None]
+    # 3. 使用线程池并行处理，各线程直接共享名称字典
+    # 4. 流式过滤有效结果，不保留所有文件的返回值
+    set_stock_names(stock_names, find_st_codes(stock_names))
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        matched_stocks = [r for r in executor.map(process_file, file_paths) if r is not None]
     
     if not matched_stocks:
         print("No stocks matched the updated filters.")
         return
 
-    # 5. 构建结果 DataFrame
-    results_df = pd.DataFrame(matched_stocks)
-    
-    # 调整列顺序
-    results_df = results_df[['Code', 'Name', 'Close', 'Date']]
-    
-    # 6. 保存结果
+    # 5. 保存结果 (结果只有几十行，直接按 OUTPUT_COLS 顺序写出，无需构建 DataFrame)
     timestamp_str = start_time.strftime('%Y%m%d_%H%M%S')
     current_year = start_time.strftime('%Y')
     current_month = start_time.strftime('%m')
@@ -209,11 +209,14 @@ def main():
     output_path = os.path.join(save_dir, output_filename)
     
     # 保存为 CSV
-    results_df.to_csv(output_path, index=False, encoding='utf-8')
+    with open(output_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(OUTPUT_COLS)
+        writer.writerows(matched_stocks)
     
     end_time = datetime.now(TIMEZONE)
     print("--- Scan Summary ---")
-    print(f"Matched stocks: {len(results_df)}")
+    print(f"Matched stocks: {len(matched_stocks)}")
     print(f"Results saved to: {output_path}")
     print(f"Time taken: {end_time - start_time}")
 
@@ -1,16 +1,27 @@
 import pandas as pd
+import numpy as np
+import io
 import os
-import glob
 import re # 导入正则表达式库用于ST排除
 from datetime import datetime
 import pytz
 import multiprocessing as mp
 
+from stock_io import list_stock_files, read_tail_bytes
+
+# numba 可用时用 JIT 编译的并行内核做批量形态判断，否则使用 NumPy 向量化实现
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
 # --- 配置 ---
 STOCK_DATA_DIR = 'stock_data'
 STOCK_NAMES_FILE = 'stock_names.csv'
 MIN_CLOSE_PRICE = 5.0
 MAX_CLOSE_PRICE = 20.0 # 新增上限过滤
+POOL_CHUNKSIZE = 64 # 每次分发给子进程的文件数，摊薄进程间通信开销
 
 # 设置上海时区
 SH_TZ = pytz.timezone('Asia/Shanghai')
@@ -26,65 +37,78 @@ COLUMN_MAPPING = {
     '成交额': 'Amount',
     '股票代码': 'Code' 
 }
-
-def is_stacked_multi_cannon(df):
+# 形态判断只用到日期和开/收/高/低，读取时跳过其余列，价格列直接按 float64 解析
+USECOLS = ['日期', '开盘', '收盘', '最高', '最低']
+PRICE_DTYPES = {col: 'float64' for col in USECOLS[1:]}
+# 形态只看最近 4 根有效 K 线，每个文件先只读取最后 TAIL_ROWS 行；
+# 其中有效行不足 4 行 (缺失值超过 TAIL_ROWS - 4 行) 时回退到读取整个文件，与原实现的整体 dropna 一致
+TAIL_ROWS = 10
+# 形态判断使用的 K 线列 (重命名后)，顺序即 bars 数组的列顺序
+BAR_COLS = ['Open', 'Close', 'High', 'Low']
+REQUIRED_COLS = ['Date'] + BAR_COLS
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _stacked_multi_cannon_njit(bars, price_min, price_max):
+        """find_stacked_multi_cannon 的 numba 版本：逐只股票直接按下标比较，不生成中间数组"""
+        n = bars.shape[0]
+        out = np.zeros(n, dtype=np.bool_)
+        for i in prange(n):
+            body1 = bars[i, 1, 1] - bars[i, 1, 0]
+            body2 = bars[i, 2, 1] - bars[i, 2, 0]
+            body3 = bars[i, 3, 1] - bars[i, 3, 0]
+            close = bars[i, 3, 1]
+            max_prev_high = max(bars[i, 0, 2], bars[i, 1, 2], bars[i, 2, 2])
+            out[i] = (body1 > 0 and body2 > 0 and body3 > 0 and
+                      abs(body1) < 0.5 * abs(body3) and abs(body2) < 0.5 * abs(body3) and
+                      close > max_prev_high and price_min <= close <= price_max)
+        return out
+
+def find_stacked_multi_cannon(bars):
     """
-    判断 K 线数据（依赖于重命名后的英文列名：Open, Close, High, Low）是否形成了
-    “叠形多方炮”形态。
+    对所有股票一次性判断是否形成了“叠形多方炮”形态。
+    bars 形状为 (股票数, 4, 4)：每只股票按日期升序的最近 4 根 K 线，列顺序为 BAR_COLS (开/收/高/低)。
+    返回与股票一一对应的布尔数组。
     
     （形态量化逻辑保持不变）
     """
-    if len(df) < 4:
-        return False
+    if HAS_NUMBA:
+        return _stacked_multi_cannon_njit(np.ascontiguousarray(bars, dtype=np.float64),
+                                          MIN_CLOSE_PRICE, MAX_CLOSE_PRICE)
 
-    # 取最近的 4 根 K 线
-    df_recent = df.iloc[-4:]
-    
-    # 检查所有必要的列是否存在
-    required_cols = ['Open', 'Close', 'High', 'Low']
-    if not all(col in df_recent.columns for col in required_cols):
-        return False
-    
-    O, C, H, L = df_recent['Open'].values, df_recent['Close'].values, df_recent['High'].values, df_recent['Low'].values
+    O, C, H = bars[:, :, 0], bars[:, :, 1], bars[:, :, 2]
     
     # K1, K2, K3, K4 的索引是 0, 1, 2, 3
-
-    # 1. K2 和 K3 必须是阳线（Close > Open）
-    is_k2_up = C[1] > O[1]
-    is_k3_up = C[2] > O[2]
-    if not (is_k2_up and is_k3_up):
-        return False
-
-    # 2. K4 必须是突破大阳线（Close > Open）
-    is_k4_up = C[3] > O[3]
-    if not is_k4_up:
-        return False
-
-    # 3. K2, K3 形成整理或叠升，实体相对较小
-    k2_body_size = abs(C[1] - O[1])
-    k3_body_size = abs(C[2] - O[2])
-    k4_body_size = abs(C[3] - O[3])
-    
-    if not (k2_body_size < 0.5 * k4_body_size and k3_body_size < 0.5 * k4_body_size):
-        return False
-
-    # 4. K4 突破 K1, K2, K3 的最高价
-    max_prev_high = max(H[0], H[1], H[2])
-    
-    # K4 的收盘价必须突破前三根 K 线的最高价
-    if C[3] <= max_prev_high:
-        return False
-        
-    # 5. K4 的最新收盘价过滤 (新增上限)
-    latest_close = C[3]
-    if not (MIN_CLOSE_PRICE <= latest_close <= MAX_CLOSE_PRICE):
-        return False
-
-    return True
-
-
-def process_single_file(file_path):
-    """处理单个股票数据文件，检查形态并返回代码（如果符合）"""
+    body = C - O
+    k4_body = np.abs(body[:, 3])
+    return (
+        # 1. K2 和 K3 必须是阳线（Close > Open）
+        (body[:, 1] > 0) & (body[:, 2] > 0) &
+        # 2. K4 必须是突破大阳线（Close > Open）
+        (body[:, 3] > 0) &
+        # 3. K2, K3 形成整理或叠升，实体相对较小
+        (np.abs(body[:, 1]) < 0.5 * k4_body) & (np.abs(body[:, 2]) < 0.5 * k4_body) &
+        # 4. K4 的收盘价必须突破 K1, K2, K3 的最高价
+        (C[:, 3] > H[:, :3].max(axis=1)) &
+        # 5. K4 的最新收盘价过滤 (新增上限)
+        (C[:, 3] >= MIN_CLOSE_PRICE) & (C[:, 3] <= MAX_CLOSE_PRICE)
+    )
+
+
+def read_bars(buf):
+    """
+    解析 CSV 字节并去掉含缺失值的行，返回 (K 线 DataFrame, 去除前的行数)；缺列时返回 (None, 0)。
+    日期只用于排序，'YYYY-MM-DD' 字符串的字典序即日期顺序，无需再解析为 datetime。
+    """
+    # 缺列的文件由下方的列检查跳过，因此 usecols 不要求所有列都存在
+    df = pd.read_csv(io.BytesIO(buf), usecols=lambda col: col in USECOLS, dtype=PRICE_DTYPES, engine='c')
+    df = df.rename(columns=COLUMN_MAPPING)
+    if not all(col in df.columns for col in REQUIRED_COLS):
+        return None, 0
+    return df.dropna(subset=REQUIRED_COLS), len(df)
+
+def load_recent_bars(file_path):
+    """读取单个股票数据文件最近 4 根 K 线，返回 (代码, 4x4 开/收/高/低数组)；无效文件返回 None"""
     stock_code = os.path.basename(file_path).split('.')[0]
     
     # 排除 30 开头的股票代码 (创业板)
@@ -96,25 +120,17 @@ def process_single_file(file_path):
     # 假设您的数据目录只包含股票数据文件。
 
     try:
-        df = pd.read_csv(file_path)
-        
-        # 1. 重命名列以适应脚本逻辑
-        df = df.rename(columns=COLUMN_MAPPING)
-        
-        required_cols = ['Date', 'Open', 'Close', 'High', 'Low']
-        if not all(col in df.columns for col in required_cols):
+        # 1. 读取尾部、重命名列并清理 NaN
+        df, rows = read_bars(read_tail_bytes(file_path, TAIL_ROWS))
+        # 2. 尾部读满 TAIL_ROWS 行仍不足 4 根有效 K 线时，改为在整个文件中清理 NaN 后再取
+        if df is not None and len(df) < 4 and rows >= TAIL_ROWS:
+            with open(file_path, 'rb') as f:
+                df, _ = read_bars(f.read())
+        if df is None or len(df) < 4:
             return None
-        
-        # 2. 解析日期并清理 NaN
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-        df = df.dropna(subset=['Date', 'Open', 'Close', 'High', 'Low'])
 
-        # 3. 确保数据按日期排序
-        df = df.sort_values(by='Date').reset_index(drop=True)
-        
-        # 4. 执行形态检查和收盘价过滤
-        if is_stacked_multi_cannon(df):
-            return stock_code
+        # 3. update.py 按日期升序追加写入，尾部即最近 4 根 K 线，无需再排序
+        return stock_code, df[BAR_COLS].to_numpy(dtype=float)[-4:]
         
     except Exception as e:
         print(f"❌ 处理文件 {file_path} 出错: {e}")
@@ -124,13 +140,14 @@ def process_single_file(file_path):
 def filter_st(results_df, names_df):
     """排除名称中含有 *ST 或 ST 的股票"""
     
-    # 将名称映射到结果 DataFrame
-    name_map = names_df.set_index('code')['name'].to_dict()
-    results_df['股票名称'] = results_df['股票代码'].map(name_map)
+    # 将名称映射到结果 DataFrame：直接用以代码为索引的 Series 做哈希连接，不再先转成 Python 字典
+    # (重复代码保留最后一条，与原先 to_dict() 的结果一致)
+    name_series = names_df.drop_duplicates(subset='code', keep='last').set_index('code')['name']
+    results_df['股票名称'] = results_df['股票代码'].map(name_series)
     
     # 使用正则表达式过滤名称中包含 *ST 或 ST 的股票
     # re.IGNORECASE 忽略大小写
-    st_mask = results_df['股票名称'].apply(lambda x: bool(re.search(r'\*?ST', str(x), re.IGNORECASE)))
+    st_mask = results_df['股票名称'].str.contains(r'\*?ST', flags=re.IGNORECASE, na=False)
     
     filtered_df = results_df[~st_mask]
     
@@ -145,19 +162,24 @@ def main():
     print(f"--- 股票形态扫描器启动 ({datetime.now(SH_TZ).strftime('%Y-%m-%d %H:%M:%S')}) ---")
     
     # 1. 查找所有数据文件
-    all_files = glob.glob(os.path.join(STOCK_DATA_DIR, '*.csv'))
+    # 按文件名 (股票代码) 排序后顺序读取
+    all_files = [path for path, _ in list_stock_files(STOCK_DATA_DIR)]
     if not all_files:
         print(f"未在 '{STOCK_DATA_DIR}' 目录下找到任何 CSV 文件。请确保数据已上传。")
         return
 
-    # 2. 并行处理所有文件 (包含 30 开头的代码排除)
+    # 2. 并行读取所有文件的最近 4 根 K 线 (包含 30 开头的代码排除)
     print(f"开始扫描 {len(all_files)} 个股票文件...")
-    pool = mp.Pool(mp.cpu_count())
-    found_codes = pool.map(process_single_file, all_files)
-    pool.close()
-    pool.join()
-    
-    found_codes = [code for code in found_codes if code is not None]
+    with mp.Pool(mp.cpu_count()) as pool:
+        loaded = [r for r in pool.imap(load_recent_bars, all_files, chunksize=POOL_CHUNKSIZE)
+                  if r is not None]
+
+    # 拼成 (股票数, 4, 4) 数组，对全部股票一次性做向量化形态判断
+    found_codes = []
+    if loaded:
+        codes, bars = zip(*loaded)
+        matched = find_stacked_multi_cannon(np.stack(bars))
+        found_codes = [code for code, is_match in zip(codes, matched) if is_match]
     
     if not found_codes:
         print("未找到符合 '叠形多方炮' 形态且符合价格/板块过滤条件的股票。")
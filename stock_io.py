@@ -0,0 +1,54 @@
+"""
+各筛选脚本共用的股票数据文件读取工具：列出数据目录下的 CSV、判断列式存储是否过期、读取 CSV 尾部。
+只依赖标准库，不引入 pandas/pyarrow，任何脚本都可直接导入。
+"""
+import mmap
+import os
+
+def list_stock_files(data_dir):
+    """
+    按文件名 (即股票代码) 排序返回数据目录下的 [(CSV 路径, 修改时间)]，目录不存在时返回空列表。
+    os.scandir 遍历目录时即可判断文件类型，修改时间与路径在同一次遍历中取得，新鲜度检查无需再逐个 stat；
+    按名称排序使读取顺序与磁盘布局更接近。
+    """
+    if not os.path.isdir(data_dir):
+        return []
+    with os.scandir(data_dir) as entries:
+        return sorted((entry.path, entry.stat().st_mtime) for entry in entries
+                      if entry.name.endswith('.csv') and entry.is_file(follow_symlinks=False))
+
+def stock_codes(stock_files):
+    """返回 list_stock_files 结果中各文件的代码 (文件名去掉扩展名)，与列式存储的 code 列取值一致"""
+    return [os.path.basename(path).split('.')[0] for path, _ in stock_files]
+
+def store_is_fresh(store_path, stock_files):
+    """
+    列式存储存在且不早于任何一个 CSV 文件时返回 True，stock_files 为 list_stock_files 的结果。
+    只比较修改时间，已删除的 CSV 仍留在存储中：读取方需按 stock_codes 过滤存储中的行。
+    """
+    if not os.path.exists(store_path):
+        return False
+    store_mtime = os.path.getmtime(store_path)
+    return all(mtime <= store_mtime for _, mtime in stock_files)
+
+def read_tail_bytes(file_path, num_rows):
+    """
+    返回 表头 + 最后 num_rows 行 的原始字节 (update.py 按日期升序追加写入，尾部即最新数据)。
+    通过 mmap 映射文件后从末尾向前查找换行符定位，只拷贝需要的表头和尾部几行。
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data_start = mm.find(b'\n') + 1
+            if data_start == 0:
+                return mm[:]  # 只有表头一行
+            end = len(mm)
+            # 文件末尾的换行符不算作行分隔
+            pos = end - 1 if mm[end - 1] == 0x0A else end
+            for _ in range(num_rows):
+                pos = mm.rfind(b'\n', data_start, pos)
+                if pos < 0:
+                    pos = data_start - 1
+                    break
+            return mm[:data_start] + mm[pos + 1:end]
@@ -28,8 +28,8 @@ NAMES_COLS_MAP = {
     'name': 'StockName'      
 }
 
-def check_stock_code_and_name(stock_code, stock_name_df):
-    """根据股票代码和名称排除非A股、ST和创业板"""
+def check_stock_code_and_name(stock_code, stock_names):
+    """根据股票代码和名称排除非A股、ST和创业板 (stock_names 为 代码 -> 名称 字典)"""
     
     # 1. 排除创业板 (30开头) 和其他非沪深A股
     if stock_code.startswith('30'):
@@ -41,10 +41,9 @@ def check_stock_code_and_name(stock_code, stock_name_df):
         
     # 2. 排除 ST 股票 (需要匹配股票名称)
     try:
-        # 在股票名称DataFrame中查找当前代码的名称
-        name_row = stock_name_df[stock_name_df[NAMES_COLS_MAP['code']] == stock_code]
-        if not name_row.empty:
-            name = name_row.iloc[0][NAMES_COLS_MAP['name']]
+        # 在股票名称字典中查找当前代码的名称
+        name = stock_names.get(stock_code)
+        if name is not None:
             if 'ST' in name or '*ST' in name:
                 return False # 排除ST股
     except:
@@ -59,7 +58,9 @@ def calculate_indicators(df):
     volume_col = HISTORICAL_COLS_MAP['成交量']
     date_col = HISTORICAL_COLS_MAP['日期']
     
-    df = df.sort_values(by=date_col).reset_index(drop=True)
+    # update.py 按日期升序追加写入，通常已有序；只在乱序时排序并重建索引
+    if not df[date_col].is_monotonic_increasing:
+        df = df.sort_values(by=date_col).reset_index(drop=True)
     
     # 计算均线和量均线
     for p in MA_PERIODS:
@@ -107,15 +108,10 @@ def apply_screener_logic(df, stock_code):
         'MA20': latest['MA20']
     }
 
-def process_single_file(file_path, stock_name_df):
-    """并行处理单个CSV文件 (增加了名称DF作为参数)"""
+def process_single_file(file_path):
+    """并行处理单个CSV文件 (代码/名称排除已在主进程完成，无需传入名称表)"""
     stock_code = os.path.basename(file_path).split('.')[0]
     
-    # --- A. 市场/ST/创业板 快速检查 ---
-    if not check_stock_code_and_name(stock_code, stock_name_df):
-        print(f"Skipping {stock_code}: Excluded by code/name rule (ST/30-Start/Non-A-Share).")
-        return None
-        
     try:
         df = pd.read_csv(file_path)
         
@@ -163,16 +159,27 @@ def main():
     # 2. 扫描所有数据文件
     all_files = glob.glob(os.path.join(DATA_DIR, '*.csv'))
     
-    # 3. 并行处理文件
+    # 3. 市场/ST/创业板 快速检查：在主进程中一次性完成，
+    #    并行任务只传文件路径，不再为每个任务序列化整张名称表
+    code_col, name_col = NAMES_COLS_MAP['code'], NAMES_COLS_MAP['name']
+    stock_names = stock_name_df.drop_duplicates(subset=code_col).set_index(code_col)[name_col].to_dict()
+    valid_files = []
+    for file in all_files:
+        stock_code = os.path.basename(file).split('.')[0]
+        if check_stock_code_and_name(stock_code, stock_names):
+            valid_files.append(file)
+        else:
+            print(f"Skipping {stock_code}: Excluded by code/name rule (ST/30-Start/Non-A-Share).")
+    
+    # 4. 并行处理文件
     print(f"Found {len(all_files)} files. Starting parallel processing...")
     num_cores = cpu_count()
     
-    # 将 stock_name_df 传递给并行函数
     results = Parallel(n_jobs=num_cores)(
-        delayed(process_single_file)(file, stock_name_df) for file in all_files
+        delayed(process_single_file)(file) for file in valid_files
     )
 
-    # 4. 收集并清洗筛选结果
+    # 5. 收集并清洗筛选结果
     successful_results = [r for r in results if r is not None]
     if not successful_results:
         print("No stocks matched the complex screening criteria.")
@@ -180,10 +187,10 @@ def main():
 
     screened_df = pd.DataFrame(successful_results)
     
-    # 5. 匹配股票名称 (使用已加载的DF)
+    # 6. 匹配股票名称 (使用已加载的DF)
     final_df = pd.merge(screened_df, stock_name_df, on=NAMES_COLS_MAP['code'], how='left')
 
-    # 6. 保存结果
+    # 7. 保存结果
     now_shanghai = datetime.now()
     output_month_dir = now_shanghai.strftime('%Y-%m')
     timestamp_str = now_shanghai.strftime('%Y%m%d_%H%MM%S')
@@ -3,8 +3,17 @@ import os
 import glob
 import logging
 from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Tuple
 from concurrent.futures import ProcessPoolExecutor
 
+# pyarrow 可用时交给其多线程 C++ 解析器读取 CSV，否则使用 pandas 默认的 C 引擎
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
 # 配置日志：设置为 WARNING 级别，使 GitHub Actions 运行日志更简洁
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -24,6 +33,20 @@ COL_CLOSE = '收盘'
 COL_OPEN = '开盘'  # 💥 用于判断是否为阳线/红K线
 COL_LOW = '最低'
 COL_VOLUME = '成交量'
+# 筛选只用到以下列，读取时跳过其余列以减少解析开销
+USECOLS = [COL_DATE, COL_OPEN, COL_CLOSE, COL_LOW, COL_VOLUME]
+# 技术筛选需要的最少交易日数 (MA20 + 3 天回踩 + 昨日 MA20)
+TECH_WINDOW = 25
+
+# --- 股票名称 ---
+
+@lru_cache(maxsize=1)
+def _load_names() -> dict:
+    """
+    读取 stock_names.csv ('code', 'name')，返回 code -> name 字典，同一进程内只读取一次。
+    """
+    names_df = pd.read_csv(STOCK_NAMES_FILE, dtype={'code': str}, usecols=['code', 'name'])
+    return dict(names_df.itertuples(index=False, name=None))
 
 # --- 核心筛选函数 ---
 
@@ -35,52 +58,50 @@ def meets_tech_criteria(df: pd.DataFrame) -> bool:
     - 放量：成交量高于 5 日均量的 2 倍，且必须是阳线。
     """
     # 确保有足够的数据来计算 MA20, MA10 和进行 3 天回踩检查 (至少 25 天)
-    if df.empty or len(df) < 25: 
+    if df.empty or len(df) < TECH_WINDOW: 
         return False
 
-    # 1. 计算均线
-    df['MA20'] = df[COL_CLOSE].rolling(window=20).mean()
-    df['MA10'] = df[COL_CLOSE].rolling(window=10).mean()
+    # 1. 只取最近 25 天的原始数组，均线直接对切片求均值，无需整列 rolling
+    close = df[COL_CLOSE].to_numpy(dtype=float)[-TECH_WINDOW:]
+    open_ = df[COL_OPEN].to_numpy(dtype=float)[-TECH_WINDOW:]
+    low = df[COL_LOW].to_numpy(dtype=float)[-TECH_WINDOW:]
+    vol = df[COL_VOLUME].to_numpy(dtype=float)[-TECH_WINDOW:]
 
-    # 取最新的数据点
-    latest = df.iloc[-1]
+    latest_close = close[-1]
+    ma20 = close[-20:].mean()
     
     # 最近三天的最低价 (模拟“三天不破”的最低点)
-    recent_lows = df[COL_LOW].iloc[-3:].min()
+    recent_lows = low[-3:].min()
 
     # --- 条件量化 ---
     
-    # 尝试获取 3 个交易日前（倒数第 4 行）的 MA10 值作为历史支撑参考
-    try:
-        ma10_three_days_ago = df['MA10'].iloc[-4]
-        ma20_yesterday = df['MA20'].iloc[-2]
-    except IndexError:
-        # 数据不足，返回 False
-        return False
+    # 3 个交易日前（倒数第 4 行）的 MA10 值作为历史支撑参考，以及昨天的 MA20
+    ma10_three_days_ago = close[-13:-3].mean()
+    ma20_yesterday = close[-21:-1].mean()
         
     # C1 (修正): 强势上升趋势确认： 
     #     a) 最新收盘价高于MA20 
     #     b) MA20 必须向上倾斜 (今天MA20 > 昨天MA20)
-    C1_Trend = (latest[COL_CLOSE] > latest['MA20']) and \
-               (latest['MA20'] > ma20_yesterday)
+    C1_Trend = (latest_close > ma20) and \
+               (ma20 > ma20_yesterday)
     
     # C2 (修正): 严格回踩三天不破确认： 
     #     a) 当前收盘价高于最近三天的最低价（确保不是在最低点买入）
     #     b) 最近三天的最低价必须严格高于 3 天前的 MA10 支撑位 (无容错，更严格)
-    C2_Retracement_Check = (latest[COL_CLOSE] > recent_lows) and \
+    C2_Retracement_Check = (latest_close > recent_lows) and \
                            (recent_lows >= ma10_three_days_ago) 
     
     # C3 (修正): 强放量阳线突破：
     #     a) 今天成交量高于前5日平均的 2.0 倍 (💥 提高放量要求)
     #     b) 今天必须是阳线/红K线 (收盘价 > 开盘价)
-    latest_vol = latest[COL_VOLUME]
-    avg_vol_5 = df[COL_VOLUME].iloc[-6:-1].mean()
+    latest_vol = vol[-1]
+    avg_vol_5 = vol[-6:-1].mean()
     
     C3_Volume = (latest_vol > avg_vol_5 * 2.0) and \
-                (latest[COL_CLOSE] > latest[COL_OPEN]) 
+                (latest_close > open_[-1]) 
     
     # 综合判断
-    return C1_Trend and C2_Retracement_Check and C3_Volume
+    return bool(C1_Trend and C2_Retracement_Check and C3_Volume)
 
 def meets_basic_criteria(df: pd.DataFrame, stock_code: str) -> bool:
     """
@@ -89,7 +110,8 @@ def meets_basic_criteria(df: pd.DataFrame, stock_code: str) -> bool:
     if df.empty:
         return False
 
-    latest_close = df.iloc[-1][COL_CLOSE]
+    # 只取最后一行的收盘价，无需先对整表排序
+    latest_close = df[COL_CLOSE].iloc[-1]
     
     # C4: 价格范围筛选 (5.0 元 <= 收盘价 <= 20.0 元)
     C4_Price_Range = (latest_close >= MIN_PRICE) and (latest_close <= MAX_PRICE)
@@ -99,35 +121,51 @@ def meets_basic_criteria(df: pd.DataFrame, stock_code: str) -> bool:
     
     return C4_Price_Range and C5_Exchange_Exclude
 
-def process_file(file_path: str) -> dict or None:
+def process_file(file_path: str) -> Optional[Tuple[str, float]]:
     """
     处理单个CSV文件并应用所有筛选条件。
+    通过时返回 (代码, 最新收盘价) 元组，未通过或读取出错时返回 None。
     """
     stock_code = os.path.basename(file_path).split('.')[0]
+
+    # 0. 先做代码前缀筛选，非深沪主板 (00, 60开头) 的文件无需读取
+    if not stock_code.startswith(('00', '60')):
+        return None
     
     try:
-        # 1. 读取和清理数据
-        df = pd.read_csv(file_path)
-        df.sort_values(COL_DATE, inplace=True)
-        df.dropna(inplace=True)
+        # 1. 只读取需要的列
+        df = pd.read_csv(file_path, usecols=USECOLS, engine=CSV_ENGINE)
 
-        # 2. 应用基本面筛选
+        # 2. 应用基本面筛选 (update.py 按日期升序追加，最后一行即最新数据)
+        #    价格不达标的股票无需排序和清理
         if not meets_basic_criteria(df, stock_code):
             return None
+
+        # 3. 排序和清理数据，供技术筛选使用 (文件通常已按日期升序，O(N) 检查后再决定是否排序)
+        if not df[COL_DATE].is_monotonic_increasing:
+            df.sort_values(COL_DATE, inplace=True)
+        df.dropna(subset=[COL_CLOSE, COL_LOW, COL_VOLUME, COL_OPEN], inplace=True)
         
-        # 3. 应用技术筛选
+        # 4. 应用技术筛选
         if not meets_tech_criteria(df):
             return None
 
-        # 4. 通过筛选，返回结果
-        latest_close = df.iloc[-1][COL_CLOSE]
-        return {'Code': stock_code, 'Close': latest_close}
+        # 5. 通过筛选，返回结果
+        latest_close = df[COL_CLOSE].iat[-1]
+        return (stock_code, latest_close)
     
     except Exception as e:
         # 记录处理单个文件时的错误，不中断其他并行任务
         logging.error(f"Error processing file {file_path}: {e}")
         return None
 
+def save_results(final_df: pd.DataFrame, output_path: str) -> None:
+    """
+    保存结果为带 UTF-8 BOM 的 CSV (便于 Excel 直接打开)。结果只有筛选出的少量行，
+    统一使用 to_csv 写出，保证输出格式 (如浮点数 10.0) 不随是否安装 pyarrow 变化。
+    """
+    final_df.to_csv(output_path, index=False, encoding='utf-8-sig')
+
 def main():
     start_time = datetime.now()
     logging.warning("--- Starting Stock Screener Advanced ---")
@@ -141,8 +179,10 @@ def main():
 
     # 2. 并行处理文件
     results = []
+    # 每个文件的任务很短，按块分发以减少进程间通信和调度次数
+    chunksize = max(1, len(file_paths) // (MAX_WORKERS * 8))
     with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        processed_results = executor.map(process_file, file_paths)
+        processed_results = executor.map(process_file, file_paths, chunksize=chunksize)
         # 收集非 None 的有效结果
         results = [res for res in processed_results if res is not None]
 
@@ -152,16 +192,14 @@ def main():
 
     # 3. 匹配股票名称 (使用 code 和 name)
     try:
-        # ⚠️ 根据您的格式：stock_names.csv 是 'code', 'name'
-        names_df = pd.read_csv(STOCK_NAMES_FILE, dtype={'code': str})
-        names_df.rename(columns={'code': 'Code', 'name': 'StockName'}, inplace=True)
+        names = _load_names()
     except Exception as e:
         logging.error(f"FATAL: Could not load stock names file {STOCK_NAMES_FILE} or column mismatch: {e}")
         return
 
-    results_df = pd.DataFrame(results)
-    
-    final_df = pd.merge(results_df, names_df, on='Code', how='left')
+    # 各进程返回 (代码, 收盘价) 元组，一次性按列名构建 DataFrame
+    final_df = pd.DataFrame(results, columns=['Code', 'Close'])
+    final_df['StockName'] = final_df['Code'].map(names)
     final_df = final_df[['Code', 'StockName', 'Close']]
 
     # 4. 保存结果到指定目录 (年月目录 + 时间戳文件名)
@@ -174,7 +212,7 @@ def main():
     output_filename = f"screener_{current_time_str}.csv"
     output_path = os.path.join(output_subdir, output_filename)
     
-    final_df.to_csv(output_path, index=False, encoding='utf-8-sig')
+    save_results(final_df, output_path)
     logging.warning(f"✅ Screening complete. {len(final_df)} stocks found. Results saved to: {output_path}")
     logging.warning(f"Total runtime: {datetime.now() - start_time}")
 
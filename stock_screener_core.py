@@ -1,77 +1,261 @@
 import pandas as pd
 import numpy as np
-import glob
+from numpy.lib.stride_tricks import sliding_window_view
+import io
 import os
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import time
 
+from stock_io import list_stock_files, read_tail_bytes, stock_codes, store_is_fresh
+
+# pyarrow 可用时使用其 C++ CSV 解析器读取单个股票文件，否则退回 pd.read_csv
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pacsv = pq = None
+
+# numba 可用时对指标计算做 JIT 编译，否则改用向量化的 NumPy 实现 (_indicators_numpy)；
+# 编译结果缓存到工作目录下，CI 中可随工作目录一起缓存，跨运行复用
+os.environ.setdefault('NUMBA_CACHE_DIR', os.path.join(os.getcwd(), '.numba_cache'))
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
 # --- 配置 ---
 STOCK_DATA_DIR = 'stock_data'  # 股票数据目录
 STOCK_NAMES_FILE = 'stock_names.csv' # 股票名称文件
 OUTPUT_DIR = 'screened_results' # 输出结果目录
 NUM_DAYS_LOOKBACK = 20 # 观察最近 N 个交易日的数据
 
-# --- 核心技术指标计算 ---
-def calculate_kdj(df, n=9, m1=3, m2=3):
-    """计算 KDJ 指标"""
-    df['收盘'] = pd.to_numeric(df['收盘'], errors='coerce')
-    df['最高'] = pd.to_numeric(df['最高'], errors='coerce')
-    df['最低'] = pd.to_numeric(df['最低'], errors='coerce')
-
-    # 计算 RSV (未成熟随机值)
-    low_list = df['最低'].rolling(window=n, min_periods=n).min()
-    high_list = df['最高'].rolling(window=n, min_periods=n).max()
-    
-    # 避免除以零
-    denominator = high_list - low_list
-    denominator[denominator == 0] = 1e-6 
-    
-    df['RSV'] = (df['收盘'] - low_list) / denominator * 100
-    
-    # 计算 K、D、J
-    df['K'] = df['RSV'].ewm(com=m1 - 1, adjust=False, min_periods=n).mean()
-    df['D'] = df['K'].ewm(com=m2 - 1, adjust=False, min_periods=n).mean()
-    df['J'] = 3 * df['K'] - 2 * df['D']
-    
-    return df
+# build_store.py 生成的列式存储，存在且比所有 CSV 都新时代替逐个读取 CSV
+STORE_PATH = os.path.join('stock_store', 'stock_data.parquet')
+# 股票名称缓存 (parquet，需 pyarrow)，stock_names.csv 更新后自动重建
+STOCK_NAMES_CACHE = os.path.join('stock_store', 'stock_names.parquet')
+
+# 指标计算用到的列 (数值列直接按 PRICE_DTYPE 解析，无需再 to_numeric)
+DATE_COL = '日期'
+NUMERIC_COLS = ['收盘', '最高', '最低', '成交量']
+# 行情数据只需约 7 位有效数字，按 float32 读取和传递以减半内存占用；
+# 指标内部的累加仍使用 float64，避免滑动求和的舍入误差累积
+PRICE_DTYPE = np.float32
+
+# 指标计算内核 (_indicators_njit / _indicators_numpy) 的输出列，顺序与其返回值一致
+INDICATOR_COLS = ['DIFF', 'DEA', 'MACD', 'K', 'D', 'J',
+                  'MA5', 'MA10', 'MA30', 'MA60', 'VOL_MA5', 'VOL_MA10', 'Vol_Ratio']
+# MA60 从第 60 行起才有值，之前的行不参与筛选
+WARMUP_ROWS = 59
+# 预筛比较时留的相对余量，需覆盖 float32 的舍入误差，避免与完整筛选不一致而误删
+PREFILTER_EPS = 1e-6
+# 工作进程以元组返回筛选结果，主进程按此结构一次性组装为列式数组；
+# mode 和 MACD_Signal 以整数编码，输出前再映射回文本
+RESULT_DTYPE = [('code', object), ('Close', np.float64), ('MA30_Value', np.float64),
+                ('Vol_Ratio', np.float64), ('MACD_Signal', np.int8),
+                ('Stop_Loss', np.float64), ('Take_Profit', np.float64), ('mode', np.int8)]
+MODE_LABELS = ['模式三：高风险预警型 (提前跑路)',
+               '模式一：底部反转启动型 (买入机会)',
+               '模式二：强势股整理再加速型 (买入机会)']
+MACD_SIGNAL_LABELS = ['No Cross', 'Golden Cross', 'Death Cross']
+# 每个文件只读取最后 TAIL_ROWS 行：MA60 只需 60 行，多读的部分用于 MACD/KDJ 的 EMA 预热，
+# 400 行后初值的影响已衰减到 1e-12 以下，筛选结果与读取全部历史一致
+TAIL_ROWS = 400
+# 主进程读取文件尾部的 IO 线程数：文件小而多时保持足够多的并发读请求，
+# 读取与工作进程中的解析、计算同时进行
+IO_THREADS = 64
 
-def calculate_indicators(df):
-    """计算 MACD, KDJ, 均线和成交量指标 - 新增 Volume Ratio 计算"""
-    # 确保有足够的数据计算 MA60 (60天)
-    if len(df) < 60:
-        return None
+# --- 核心技术指标计算 ---
+@njit(cache=True)
+def _ema(x, alpha, start):
+    """递推 EMA (等价于 pandas ewm(adjust=False))，从 start 位置开始，之前为 NaN"""
+    out = np.full(x.shape[0], np.nan)
+    e = x[start]
+    out[start] = e
+    for i in range(start + 1, x.shape[0]):
+        e = alpha * x[i] + (1.0 - alpha) * e
+        out[i] = e
+    return out
+
+@njit(cache=True)
+def _rolling_mean(x, window):
+    """滑动窗口均值 (等价于 rolling(window).mean())，前 window-1 个为 NaN"""
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    total = 0.0
+    for i in range(n):
+        total += x[i]
+        if i >= window:
+            total -= x[i - window]
+        if i >= window - 1:
+            out[i] = total / window
+    return out
+
+@njit(cache=True)
+def _rolling_extreme(x, window, is_max):
+    """
+    滑动窗口最小值/最大值，前 window-1 个为 NaN。
+    用单调队列保存窗口内的候选下标，每个元素只进出队列一次，复杂度 O(n)。
+    """
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    queue = np.empty(n, dtype=np.int32)
+    head = 0
+    tail = 0
+    for i in range(n):
+        # 队尾中不可能再成为极值的元素出队
+        while tail > head and ((x[queue[tail - 1]] <= x[i]) if is_max else (x[queue[tail - 1]] >= x[i])):
+            tail -= 1
+        queue[tail] = i
+        tail += 1
+        # 队首已滑出窗口
+        if queue[head] <= i - window:
+            head += 1
+        if i >= window - 1:
+            out[i] = x[queue[head]]
+    return out
+
+@njit(cache=True)
+def _rolling_min(x, window):
+    """滑动窗口最小值，前 window-1 个为 NaN"""
+    return _rolling_extreme(x, window, False)
+
+@njit(cache=True)
+def _rolling_max(x, window):
+    """滑动窗口最大值，前 window-1 个为 NaN"""
+    return _rolling_extreme(x, window, True)
+
+@njit(cache=True)
+def _indicators_njit(close, high, low, vol):
+    """
+    一次性计算 MACD, KDJ(9,3,3), 均线和成交量指标，输入为不含 NaN 的 float32 数组，
+    按 INDICATOR_COLS 的顺序返回与输入等长的 float64 数组 (未满窗口的位置为 NaN)。
+    """
+    n = close.shape[0]
 
-    # 统一数据类型
-    df['收盘'] = pd.to_numeric(df['收盘'], errors='coerce')
-    df['成交量'] = pd.to_numeric(df['成交量'], errors='coerce')
-    df['最高'] = pd.to_numeric(df['最高'], errors='coerce')
-    df['最低'] = pd.to_numeric(df['最低'], errors='coerce')
+    # 第一遍：EMA 递推和滑动窗口，逐元素依赖前值，只能顺序计算
 
-    # 1. MACD 计算
-    ema_short = df['收盘'].ewm(span=12, adjust=False).mean()
-    ema_long = df['收盘'].ewm(span=26, adjust=False).mean()
-    df['DIFF'] = ema_short - ema_long
-    df['DEA'] = df['DIFF'].ewm(span=9, adjust=False).mean()
-    df['MACD'] = (df['DIFF'] - df['DEA']) * 2 
+    # 1. MACD: EMA12 - EMA26，DEA 为 DIFF 的 EMA9
+    diff = _ema(close, 2.0 / 13.0, 0) - _ema(close, 2.0 / 27.0, 0)
+    dea = _ema(diff, 2.0 / 10.0, 0)
 
-    # 2. KDJ 计算
-    df = calculate_kdj(df)
+    # 2. KDJ: RSV 从第 9 天起有值，K/D 为 com=2 的 EMA，各需 9 个有效值
+    low_list = _rolling_min(low, 9)
+    high_list = _rolling_max(high, 9)
+    rsv = (close - low_list) / np.maximum(high_list - low_list, 1e-6) * 100
+    k = _ema(rsv, 1.0 / 3.0, 8)
+    k[:16] = np.nan
+    d = np.full(n, np.nan)
+    if n > 16:
+        d = _ema(k, 1.0 / 3.0, 16)
+        d[:24] = np.nan
 
     # 3. 均线 (MA)
-    df['MA5'] = df['收盘'].rolling(window=5).mean()
-    df['MA10'] = df['收盘'].rolling(window=10).mean()
-    df['MA30'] = df['收盘'].rolling(window=30).mean()
-    df['MA60'] = df['收盘'].rolling(window=60).mean()
+    ma5 = _rolling_mean(close, 5)
+    ma10 = _rolling_mean(close, 10)
+    ma30 = _rolling_mean(close, 30)
+    ma60 = _rolling_mean(close, 60)
+
+    # 4. 成交量均线 (VOL)
+    vol_ma5 = _rolling_mean(vol, 5)
+    vol_ma10 = _rolling_mean(vol, 10)
+
+    # 第二遍：派生列 MACD 柱和 J 值，各次迭代互不依赖，合并为一个无分支循环，
+    # 便于 LLVM 自动向量化且不产生临时数组
+    macd = np.empty(n)
+    j = np.empty(n)
+    for i in range(n):
+        macd[i] = (diff[i] - dea[i]) * 2
+        j[i] = 3 * k[i] - 2 * d[i]
+
+    # Vol_Ratio (最新成交量 / 近5日均量) 用数组表达式计算：按 NumPy 语义除以 0 得到 inf/NaN，
+    # 标量除法在 numba 中会对前 4 个 NaN 均量或停牌的 0 均量抛出 ZeroDivisionError
+    vol_ratio = vol / vol_ma5
+
+    return diff, dea, macd, k, d, j, ma5, ma10, ma30, ma60, vol_ma5, vol_ma10, vol_ratio
+
+def _window_reduce(x, window, reduce):
+    """用 sliding_window_view 对长度为 window 的滑动窗口做一次归约，前 window-1 个补 NaN"""
+    out = np.full(x.shape[0], np.nan)
+    if x.shape[0] >= window:
+        out[window - 1:] = reduce(sliding_window_view(x, window), axis=-1)
+    return out
+
+def _ewm(x, alpha):
+    """
+    递推 EMA (adjust=False)，从第一个非 NaN 值开始，与 _ema 一致。
+    返回可写的副本：pandas Copy-on-Write 下 to_numpy() 可能是只读视图，调用方会原地写入 NaN。
+    """
+    return pd.Series(x).ewm(alpha=alpha, adjust=False).mean().to_numpy(dtype=np.float64, copy=True)
+
+def _indicators_numpy(close, high, low, vol):
+    """
+    _indicators_njit 的纯 NumPy 版本，numba 不可用时使用：
+    滑动窗口用 sliding_window_view 一次向量化归约，EMA 递推交给 pandas ewm。
+    """
+    close, high, low, vol = (np.asarray(a, dtype=np.float64) for a in (close, high, low, vol))
+
+    # 1. MACD
+    diff = _ewm(close, 2.0 / 13.0) - _ewm(close, 2.0 / 27.0)
+    dea = _ewm(diff, 2.0 / 10.0)
+
+    # 2. KDJ
+    low_list = _window_reduce(low, 9, np.min)
+    high_list = _window_reduce(high, 9, np.max)
+    rsv = (close - low_list) / np.maximum(high_list - low_list, 1e-6) * 100
+    k = _ewm(rsv, 1.0 / 3.0)
+    k[:16] = np.nan
+    d = _ewm(k, 1.0 / 3.0)
+    d[:24] = np.nan
 
-    # 4. 成交量 (VOL) - 新增 VOL_MA5 和 Vol_Ratio
-    df['VOL_MA5'] = df['成交量'].rolling(window=5).mean()
-    df['VOL_MA10'] = df['成交量'].rolling(window=10).mean()
-    # 新增: Vol_Ratio = 最新成交量 / 近5日均量
-    df['Vol_Ratio'] = df['成交量'] / df['VOL_MA5']
+    # 3. 均线 (MA) 和成交量均线 (VOL)
+    ma5, ma10, ma30, ma60 = (_window_reduce(close, w, np.mean) for w in (5, 10, 30, 60))
+    vol_ma5 = _window_reduce(vol, 5, np.mean)
+    vol_ma10 = _window_reduce(vol, 10, np.mean)
 
-    # 确保数据完整，去掉 NaN 行
-    return df.dropna()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol_ratio = vol / vol_ma5
+
+    return (diff, dea, (diff - dea) * 2, k, d, 3 * k - 2 * d,
+            ma5, ma10, ma30, ma60, vol_ma5, vol_ma10, vol_ratio)
+
+# 导入时选定指标计算内核
+_compute_indicators = _indicators_njit if HAS_NUMBA else _indicators_numpy
+
+def calculate_indicators(df, tail=None):
+    """
+    计算 MACD, KDJ, 均线和成交量指标 - 新增 Volume Ratio 计算
+    tail 不为 None 时只组装最后 tail 个有效交易日，避免为整段历史构造 DataFrame。
+    调用方需已按日期排序并去掉 NUMERIC_COLS 中含 NaN 的行。
+    """
+    # 确保有足够的数据计算 MA60 (60天)
+    if len(df) < 60:
+        return None
+
+    indicators = _compute_indicators(
+        df['收盘'].to_numpy(dtype=PRICE_DTYPE),
+        df['最高'].to_numpy(dtype=PRICE_DTYPE),
+        df['最低'].to_numpy(dtype=PRICE_DTYPE),
+        df['成交量'].to_numpy(dtype=PRICE_DTYPE),
+    )
+
+    # 只保留 MA60 有值之后、且所有列都不为 NaN 的行 (等价于对完整结果 dropna)
+    columns = {col: df[col].to_numpy()[WARMUP_ROWS:] for col in [DATE_COL] + NUMERIC_COLS}
+    columns.update((col, values[WARMUP_ROWS:]) for col, values in zip(INDICATOR_COLS, indicators))
+    valid = pd.notna(columns[DATE_COL])
+    for col in NUMERIC_COLS + INDICATOR_COLS:
+        valid &= ~np.isnan(columns[col])
+    rows = np.flatnonzero(valid)
+    if tail is not None:
+        rows = rows[-tail:]
+
+    return pd.DataFrame({col: values[rows] for col, values in columns.items()})
 
 # --- 筛选逻辑 ---
 
@@ -158,40 +342,143 @@ def check_mode_3(df_recent, df_full):
 
     return kdj_signal and is_price_breakdown and is_macd_not_death
 
-# --- 工具函数：获取MACD信号文本 ---
-def get_macd_signal_text(last, prev):
+def _fast_prefilter(close, vol):
+    """
+    预筛：只用最近 60 天的收盘价和成交量检查三种模式各自的必要条件，
+    都不可能满足时返回 False，跳过完整的指标计算。
+    """
+    last, prev = close[-1], close[-2]
+    ma10 = close[-10:].mean()
+    ma30 = close[-30:].mean()
+    ma60 = close[-60:].mean()
+    vol_ma5 = vol[-5:].mean()
+    lo, hi = 1 - PREFILTER_EPS, 1 + PREFILTER_EPS
+
+    # 近 5 日成交量全为 0 时 Vol_Ratio 无效，交给完整流程处理
+    if vol_ma5 == 0:
+        return True
+
+    # 模式三：收盘价跌破 MA10
+    if last < ma10 * hi:
+        return True
+
+    # 模式一：收盘价站上 MA30、当日涨幅大于 5% 且放量
+    if last > ma30 * lo and last > prev * 1.05 * lo and vol[-1] > vol_ma5 * 1.25 * lo:
+        return True
+
+    # 模式二：多头排列、紧贴 MA10、收阳且放量
+    return (ma10 > ma30 * lo and ma30 > ma60 * lo and
+            last < ma10 * 1.01 * hi and last > prev * lo and
+            vol[-1] > vol[-10:].mean() * 1.5 * lo)
+
+# --- 工具函数：获取MACD信号 (MACD_SIGNAL_LABELS 的下标) ---
+def get_macd_signal(last, prev):
     if last['DIFF'] > last['DEA'] and prev['DIFF'] <= prev['DEA']:
-        return 'Golden Cross'
+        return 1
     elif last['DIFF'] < last['DEA'] and prev['DIFF'] >= prev['DEA']:
-        return 'Death Cross'
+        return 2
     else:
-        return 'No Cross'
+        return 0
+
+# --- 数据读取 ---
+def read_stock_tail(file_path):
+    """读取单个股票文件 表头 + 最后 TAIL_ROWS 行 的字节，失败时返回 None (在 IO 线程中调用)"""
+    try:
+        return read_tail_bytes(file_path, TAIL_ROWS)
+    except OSError:
+        return None
+
+def parse_stock_csv(buf):
+    """从 read_tail_bytes 返回的字节中解析指标计算需要的列"""
+    if pacsv is None:
+        return pd.read_csv(io.BytesIO(buf), encoding='utf-8', engine='c',
+                           usecols=[DATE_COL] + NUMERIC_COLS,
+                           dtype={col: PRICE_DTYPE for col in NUMERIC_COLS})
+
+    table = pacsv.read_csv(
+        pa.BufferReader(buf),
+        # 外层已按文件并行，单个文件内不再开线程
+        read_options=pacsv.ReadOptions(use_threads=False),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=[DATE_COL] + NUMERIC_COLS,
+            column_types={DATE_COL: pa.string(), **{col: pa.float32() for col in NUMERIC_COLS}},
+        ),
+    )
+    return table.to_pandas()
+
+def read_stock_store(codes):
+    """
+    从列式存储一次读取 codes 中的股票 (即当前仍有 CSV 文件的股票)，返回 [(code, df), ...]。
+    build_store.py 按 code、日期升序写入，每只股票只保留最后 TAIL_ROWS 行。
+    """
+    table = pq.read_table(STORE_PATH, columns=['code', DATE_COL] + NUMERIC_COLS,
+                          filters=[('code', 'in', codes)])
+    df = table.to_pandas()
+    return [(code, group[[DATE_COL] + NUMERIC_COLS].tail(TAIL_ROWS))
+            for code, group in df.groupby('code', sort=False)]
+
+def _build_names_cache():
+    """
+    读取 stock_names.csv，生成 code (补齐 6 位) -> name 字典；
+    pyarrow 可用时同时写入 STOCK_NAMES_CACHE (parquet，只含字符串两列，不执行任何反序列化代码)。
+    """
+    names_df = pd.read_csv(STOCK_NAMES_FILE, encoding='utf-8', dtype={'code': str}, usecols=['code', 'name'])
+    names_df = names_df.dropna(subset=['code', 'name'])
+    names_df['code'] = names_df['code'].str.zfill(6)
+
+    if pq is not None:
+        os.makedirs(os.path.dirname(STOCK_NAMES_CACHE), exist_ok=True)
+        tmp_path = STOCK_NAMES_CACHE + '.tmp'
+        pq.write_table(pa.Table.from_pandas(names_df, preserve_index=False), tmp_path)
+        os.replace(tmp_path, STOCK_NAMES_CACHE)
+    return dict(zip(names_df['code'], names_df['name']))
+
+def load_stock_names():
+    """返回 code -> name 字典，缓存不早于 stock_names.csv 时直接加载缓存"""
+    if (pq is not None and os.path.exists(STOCK_NAMES_CACHE) and
+            os.path.getmtime(STOCK_NAMES_CACHE) >= os.path.getmtime(STOCK_NAMES_FILE)):
+        columns = pq.read_table(STOCK_NAMES_CACHE, columns=['code', 'name']).to_pydict()
+        return dict(zip(columns['code'], columns['name']))
+    return _build_names_cache()
 
 # --- 并行处理函数 ---
-def process_stock_file(file_path):
-    """处理单个股票文件，计算指标并筛选"""
+def _init_worker():
+    """进程池初始化函数：在每个工作进程中预先编译 (或从缓存加载) 指标计算内核"""
+    warmup = np.ones(WARMUP_ROWS + 1, dtype=PRICE_DTYPE)
+    _compute_indicators(warmup, warmup, warmup, warmup)
+
+def process_stock_buffer(file_path, buf):
+    """解析主进程读入的单个股票文件字节，计算指标并筛选"""
+    if buf is None:
+        return None
     try:
-        df = pd.read_csv(file_path, encoding='utf-8')
-        df = df.sort_values(by='日期')
-
-        df.rename(columns={
-            '成交量': '成交量',
-            '收盘': '收盘',
-            '最高': '最高',
-            '最低': '最低'
-        }, inplace=True)
-
-        df_calc = calculate_indicators(df)
-        if df_calc is None:
+        df = parse_stock_csv(buf)
+    except Exception:
+        return None
+    return process_stock_frame(os.path.basename(file_path).split('.')[0], df)
+
+def process_stock_frame(stock_code, df):
+    """对单个股票的行情数据计算指标并筛选"""
+    try:
+        # 文件/存储中的行通常已按日期升序，O(N) 检查后只在乱序时排序
+        if not df[DATE_COL].is_monotonic_increasing:
+            df = df.sort_values(by=DATE_COL)
+        df = df.dropna(subset=NUMERIC_COLS)
+        if len(df) < 60:
             return None
 
-        # 筛选只看最近 NUM_DAYS_LOOKBACK 天的数据
-        df_recent = df_calc.tail(NUM_DAYS_LOOKBACK)
+        # 先做廉价预筛，三种模式的必要条件都不满足时无需计算指标
+        if not _fast_prefilter(df['收盘'].to_numpy(dtype=np.float64),
+                               df['成交量'].to_numpy(dtype=np.float64)):
+            return None
+
+        # 筛选只看最近 NUM_DAYS_LOOKBACK 天的数据，只为这些行构造 DataFrame
+        df_recent = calculate_indicators(df, tail=NUM_DAYS_LOOKBACK)
+        if df_recent is None:
+            return None
         if len(df_recent) < 2: # 至少需要两天来判断交叉和涨跌
              return None
 
-        stock_code = os.path.basename(file_path).split('.')[0]
-        
         last = df_recent.iloc[-1]
         prev = df_recent.iloc[-2]
         
@@ -204,81 +491,70 @@ def process_stock_file(file_path):
         # 建议止盈价：短期目标盈利 5%
         take_profit_price = close_price * 1.05
         
-        result = {
-            'code': stock_code,
-            'Close': f"{close_price:.2f}",
-            'MA30_Value': f"{ma30_value:.2f}",
-            'Vol_Ratio': f"{last['Vol_Ratio']:.2f}",
-            'MACD_Signal': get_macd_signal_text(last, prev),
-            'Stop_Loss': f"{stop_loss_price:.2f}",
-            'Take_Profit': f"{take_profit_price:.2f}",
-        }
-        
-        # 优先级：风险预警 > 买入机会
-        if check_mode_3(df_recent, df_calc):
-            result['mode'] = '模式三：高风险预警型 (提前跑路)'
-            result['type'] = 'Warning'
-        elif check_mode_1(df_recent, df_calc):
-            result['mode'] = '模式一：底部反转启动型 (买入机会)'
-            result['type'] = 'Buy'
-        elif check_mode_2(df_recent, df_calc):
-            result['mode'] = '模式二：强势股整理再加速型 (买入机会)'
-            result['type'] = 'Buy'
+        # 优先级：风险预警 > 买入机会 (mode 为 MODE_LABELS 的下标)
+        if check_mode_3(df_recent, df_recent):
+            mode = 0
+        elif check_mode_1(df_recent, df_recent):
+            mode = 1
+        elif check_mode_2(df_recent, df_recent):
+            mode = 2
         else:
             return None
 
-        return result
+        # 字段顺序与 RESULT_DTYPE 一致，数值的格式化留到写出 CSV 时统一处理
+        return (stock_code, close_price, ma30_value, last['Vol_Ratio'], get_macd_signal(last, prev),
+                stop_loss_price, take_profit_price, mode)
 
     except Exception as e:
         # 实际运行中可以打印错误信息进行调试
-        # print(f"处理文件 {file_path} 出错: {e}") 
+        # print(f"处理股票 {stock_code} 出错: {e}") 
         return None
 
 # --- 主函数 ---
 def main():
     start_time = time.time()
     
-    all_files = glob.glob(os.path.join(STOCK_DATA_DIR, '*.csv'))
+    stock_files = list_stock_files(STOCK_DATA_DIR)
+    all_files = [path for path, _ in stock_files]
     
     if not all_files:
         print(f"未找到 {STOCK_DATA_DIR} 目录下的 CSV 文件。")
         return
 
-    print(f"开始扫描 {len(all_files)} 个股票文件，使用并行处理...")
-    results = []
-    # 根据 CPU 核心数设置最大工作线程数
-    max_workers = os.cpu_count() * 2 if os.cpu_count() else 4
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(process_stock_file, file) for file in all_files]
-        for future in futures:
-            result = future.result()
-            if result:
-                results.append(result)
+    # 指标计算是 CPU 密集型，使用多进程绕过 GIL；按块分发任务以摊薄进程间通信开销
+    max_workers = os.cpu_count() or 4
+    chunksize = max(1, len(all_files) // (max_workers * 4))
+    if pq is not None and store_is_fresh(STORE_PATH, stock_files):
+        print(f"从 {STORE_PATH} 读取 {len(all_files)} 只股票，使用并行处理...")
+        store = read_stock_store(stock_codes(stock_files))
+        codes, frames = zip(*store) if store else ((), ())
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+            results = [result for result in executor.map(process_stock_frame, codes, frames, chunksize=chunksize) if result is not None]
+    else:
+        print(f"开始扫描 {len(all_files)} 个股票文件，使用并行处理...")
+        # IO 线程并发读取文件尾部；executor.map 边消费读取结果边提交任务，读取与计算重叠进行
+        with ThreadPoolExecutor(max_workers=IO_THREADS) as io_pool, \
+                ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+            bufs = io_pool.map(read_stock_tail, all_files)
+            results = [result for result in executor.map(process_stock_buffer, all_files, bufs, chunksize=chunksize) if result is not None]
 
     if not results:
         print("未筛选出符合条件的股票。")
         return
 
+    # 按列组装结果，整数编码映射回文本
+    final_df = pd.DataFrame(np.array(results, dtype=RESULT_DTYPE))
+    final_df['code'] = final_df['code'].astype(str).str.zfill(6)
+    final_df['mode'] = np.array(MODE_LABELS)[final_df['mode'].to_numpy()]
+    final_df['MACD_Signal'] = np.array(MACD_SIGNAL_LABELS)[final_df['MACD_Signal'].to_numpy()]
+
     # 3. 匹配股票名称 
     try:
-        names_df = pd.read_csv(STOCK_NAMES_FILE, encoding='utf-8')
-        names_df.rename(columns={'code': 'code', 'name': 'name'}, inplace=True)
-        names_df['code'] = names_df['code'].astype(str).str.zfill(6)
-        
-        results_df = pd.DataFrame(results)
-        results_df['code'] = results_df['code'].astype(str).str.zfill(6)
-        
-        final_df = pd.merge(results_df, names_df, on='code', how='left')
-        final_df['name'] = final_df['name'].fillna('名称未知')
-
+        names = load_stock_names()
+        final_df['name'] = final_df['code'].map(names).fillna('名称未知')
     except Exception as e:
         print(f"加载或匹配股票名称文件出错: {e}")
-        final_df = pd.DataFrame(results)
         final_df['name'] = '名称未知'
-        # 如果名称匹配失败，也要确保其他指标能输出
-        for col in ['Close', 'MA30_Value', 'Vol_Ratio', 'MACD_Signal', 'Stop_Loss', 'Take_Profit']:
-             if col not in final_df.columns:
-                 final_df[col] = ''
 
     # 4. 输出到指定目录 
     now = datetime.now()
@@ -293,7 +569,7 @@ def main():
     
     # 最终输出列：包含名称、模式、指标和风险管理
     final_df = final_df[['code', 'name', 'mode', 'Close', 'MA30_Value', 'Vol_Ratio', 'MACD_Signal', 'Stop_Loss', 'Take_Profit']]
-    final_df.to_csv(output_path, index=False, encoding='utf-8')
+    final_df.to_csv(output_path, index=False, encoding='utf-8', float_format='%.2f')
     
     end_time = time.time()
     duration = end_time - start_time
@@ -0,0 +1,79 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import stock_screener_core as core
+
+
+def baseline_indicators(df):
+    """优化前 calculate_indicators 的 pandas 实现，作为各计算内核的对照"""
+    df = df.copy()
+    df['DIFF'] = df['收盘'].ewm(span=12, adjust=False).mean() - df['收盘'].ewm(span=26, adjust=False).mean()
+    df['DEA'] = df['DIFF'].ewm(span=9, adjust=False).mean()
+    df['MACD'] = (df['DIFF'] - df['DEA']) * 2
+
+    low_list = df['最低'].rolling(window=9, min_periods=9).min()
+    high_list = df['最高'].rolling(window=9, min_periods=9).max()
+    denominator = high_list - low_list
+    denominator[denominator == 0] = 1e-6
+    rsv = (df['收盘'] - low_list) / denominator * 100
+    df['K'] = rsv.ewm(com=2, adjust=False, min_periods=9).mean()
+    df['D'] = df['K'].ewm(com=2, adjust=False, min_periods=9).mean()
+    df['J'] = 3 * df['K'] - 2 * df['D']
+
+    for window in (5, 10, 30, 60):
+        df[f'MA{window}'] = df['收盘'].rolling(window=window).mean()
+    df['VOL_MA5'] = df['成交量'].rolling(window=5).mean()
+    df['VOL_MA10'] = df['成交量'].rolling(window=10).mean()
+    df['Vol_Ratio'] = df['成交量'] / df['VOL_MA5']
+    return df.dropna().reset_index(drop=True)
+
+
+def make_stock_frame(seed, rows=300):
+    """随机游走行情；中间插入连续 5 天成交量为 0 的停牌段，覆盖均量为 0 的情况"""
+    rng = np.random.default_rng(seed)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, rows)))
+    high = close * (1 + rng.uniform(0, 0.03, rows))
+    low = close * (1 - rng.uniform(0, 0.03, rows))
+    volume = rng.integers(1_000, 1_000_000, rows).astype(np.float64)
+    volume[150:155] = 0
+    df = pd.DataFrame({
+        core.DATE_COL: pd.date_range('2020-01-01', periods=rows).strftime('%Y-%m-%d'),
+        '收盘': close, '最高': high, '最低': low, '成交量': volume,
+    })
+    # 计算内核按 PRICE_DTYPE 读取，对照组使用相同精度的输入
+    df[core.NUMERIC_COLS] = df[core.NUMERIC_COLS].astype(core.PRICE_DTYPE).astype(np.float64)
+    return df
+
+
+def kernels():
+    yield pytest.param(core._indicators_numpy, id='numpy')
+    if core.HAS_NUMBA:
+        yield pytest.param(core._indicators_njit, id='njit')
+
+
+@pytest.mark.parametrize('kernel', list(kernels()))
+@pytest.mark.parametrize('seed', range(5))
+def test_indicators_match_baseline(monkeypatch, kernel, seed):
+    monkeypatch.setattr(core, '_compute_indicators', kernel)
+    df = make_stock_frame(seed)
+
+    expected = baseline_indicators(df)
+    result = core.calculate_indicators(df)
+
+    assert list(result[core.DATE_COL]) == list(expected[core.DATE_COL])
+    for col in core.INDICATOR_COLS:
+        np.testing.assert_allclose(result[col].to_numpy(), expected[col].to_numpy(),
+                                   rtol=1e-5, atol=1e-6, err_msg=col)
+
+
+@pytest.mark.parametrize('kernel', list(kernels()))
+def test_init_worker_warms_up_kernel(monkeypatch, kernel):
+    # 进程池初始化时预热内核，任何异常都会导致 BrokenProcessPool
+    monkeypatch.setattr(core, '_compute_indicators', kernel)
+    core._init_worker()
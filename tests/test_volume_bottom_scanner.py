@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import volume_bottom_scanner as vbs
+from stock_io import list_stock_files
+
+HEADER = '日期,开盘,收盘,最高,最低,成交量,成交额\n'
+
+
+def make_rows(rng, start, count, float_volume=False):
+    """生成 count 行与 update.py 输出格式一致的日线数据，日期从 start 起按自然日递增"""
+    dates = pd.date_range(start, periods=count).strftime('%Y-%m-%d')
+    closes = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, count))), 2)
+    volumes = rng.integers(100, 1_000_000, count)
+    rows = []
+    for date, close, volume in zip(dates, closes, volumes):
+        volume = f'{volume + 0.5}' if float_volume else f'{volume}'
+        rows.append(f'{date},{close:.2f},{close:.2f},{close * 1.01:.2f},{close * 0.99:.2f},{volume},{close * 1e4:.1f}\n')
+    return rows
+
+
+def write_stock(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(HEADER)
+        f.writelines(rows)
+
+
+@pytest.fixture
+def stock_dir(tmp_path, monkeypatch):
+    """在临时工作目录下生成 stock_data/，各脚本的相对路径 (如列式存储) 都落在其中"""
+    monkeypatch.chdir(tmp_path)
+    data_dir = tmp_path / vbs.STOCK_DATA_DIR
+    data_dir.mkdir()
+    rng = np.random.default_rng(0)
+    for i in range(8):
+        write_stock(data_dir / f'60000{i}.csv', make_rows(rng, '2023-01-01', 200, float_volume=(i == 7)))
+    return data_dir
+
+
+def scan(stock_dir, use_store):
+    """按 main 的方式列出文件并读取窗口，返回 {code: (closes, volumes)}"""
+    stock_files = list_stock_files(stock_dir)
+    candidates = {os.path.basename(path)[:6]: (path, '测试') for path, _ in stock_files}
+    codes, _, closes, volumes = vbs.load_candidate_windows(stock_files, candidates, use_store=use_store)
+    return {code: (np.asarray(c), np.asarray(v)) for code, c, v in zip(codes, closes, volumes)}
+
+
+def assert_same_windows(result, expected):
+    assert sorted(result) == sorted(expected)
+    for code, (closes, volumes) in expected.items():
+        np.testing.assert_array_equal(result[code][0], closes, err_msg=code)
+        np.testing.assert_array_equal(result[code][1], volumes, err_msg=code)
+        # 成交量类型按股票各自决定 (600007 为小数成交量，不影响其他股票保持整数)
+        assert result[code][1].dtype == volumes.dtype, code
+
+
+def test_csv_path_matches_store(stock_dir):
+    if vbs.build_store is None:
+        pytest.skip('列式存储依赖 pyarrow')
+    assert_same_windows(scan(stock_dir, use_store=False), scan(stock_dir, use_store=True))
+
+
+
+def test_store_skips_deleted_csv(stock_dir):
+    if vbs.build_store is None:
+        pytest.skip('列式存储依赖 pyarrow')
+    scan(stock_dir, use_store=True)
+    # 删除文件不会使存储过期，读取时按现有文件过滤
+    os.remove(stock_dir / '600003.csv')
+    assert '600003' not in scan(stock_dir, use_store=True)
@@ -3,7 +3,8 @@ import pandas as pd
 import numpy as np
 import time
 import os
-from datetime import datetime, timedelta
+import re
+from datetime import datetime, timedelta, timezone
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
@@ -14,6 +15,21 @@ PROGRESS_FILE = os.path.join(RESULTS_DIR, 'progress.txt')
 LAST_RUN_DATE_FILE = os.path.join(RESULTS_DIR, 'last_run_date.txt')
 MAX_WORKERS = 15 # 并发线程数
 
+# 全市场行情快照：收盘后一次请求即可拿到所有股票当日的 OHLCV，
+# 对只缺当日一根 K 线的股票直接追加，无需逐只请求历史接口
+BEIJING_TZ = timezone(timedelta(hours=8))
+SPOT_READY_TIME = (15, 30) # 北京时间该时刻之后快照才是当日收盘数据
+# 历史数据列 -> 快照列 (当日 K 线的前复权价格与不复权价格一致)
+SPOT_COLUMN_MAP = {
+    '开盘': '今开', '收盘': '最新价', '最高': '最高', '最低': '最低',
+    '成交量': '成交量', '成交额': '成交额', '振幅': '振幅',
+    '涨跌幅': '涨跌幅', '涨跌额': '涨跌额', '换手率': '换手率',
+}
+
+# 只读取 CSV 末尾这么多字节来确定最后一个交易日
+TAIL_BLOCK_SIZE = 4096
+DATE_LINE_RE = re.compile(rb'^(\d{4}-\d{2}-\d{2})(?:[ T][\d:]+)?,')
+
 # 修改：定义股票列表文件路径为文本文件 (列表.txt)
 STOCK_LIST_FILE = '列表.txt' 
 
@@ -71,27 +87,89 @@ def get_stock_list():
         print("警告: 无法在列表中找到 '代码' 和 '名称' (或其兼容名称如'code','name','symbol') 列。")
         return pd.DataFrame()
     
+def get_spot_snapshot():
+    """
+    获取全市场当日收盘行情快照。
+    返回 (当日日期, 上一交易日, {6 位代码: {历史数据列: 值}})；
+    非交易日、尚未收盘或请求失败时返回 None，由调用方逐只下载历史数据。
+    """
+    now = datetime.now(BEIJING_TZ)
+    if (now.hour, now.minute) < SPOT_READY_TIME:
+        return None
+
+    try:
+        trade_dates = pd.to_datetime(ak.tool_trade_date_hist_sina()['trade_date'])
+        today = pd.Timestamp(now.date())
+        if not (trade_dates == today).any():
+            return None
+        prev_trade_date = trade_dates[trade_dates < today].max()
+        spot_df = ak.stock_zh_a_spot_em()
+    except Exception as e:
+        print(f"获取全市场行情快照失败，将逐只下载历史数据: {e}")
+        return None
+
+    # 停牌等无当日价格的股票不在快照中，回退到逐只下载
+    spot_df = spot_df.dropna(subset=['今开', '最新价', '最高', '最低'])
+    spot_df = spot_df[spot_df['成交量'] > 0]
+
+    rows = {}
+    for record in spot_df.to_dict('records'):
+        code = str(record['代码']).zfill(6)
+        row = {'日期': today.strftime('%Y-%m-%d'), '股票代码': code}
+        row.update((hist_col, record[spot_col]) for hist_col, spot_col in SPOT_COLUMN_MAP.items()
+                   if spot_col in record)
+        row['成交量'] = int(row['成交量'])
+        rows[code] = row
+    return today, prev_trade_date, rows
+
+def append_spot_row(file_path, row):
+    """
+    按文件已有的表头顺序，把快照中的当日一行追加到 CSV 末尾。
+    与增量下载相同，经 DataFrame.to_csv 写出，缺失值、浮点数的格式与已有数据一致。
+    """
+    header = pd.read_csv(file_path, nrows=0, encoding='utf-8').columns
+    pd.DataFrame([row], columns=header).to_csv(file_path, mode='a', header=False, index=False, encoding='utf-8')
+
+def last_csv_date(file_path):
+    """
+    反向定位 CSV 最后一行并解析其日期，避免每次增量更新都解析整个文件。
+    末行不是合法日期 (空文件、只有表头、格式异常) 时回退到完整读取；无有效数据返回 None。
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - TAIL_BLOCK_SIZE))
+        lines = f.read().splitlines()
+    match = DATE_LINE_RE.match(lines[-1]) if lines else None
+    if match:
+        return pd.Timestamp(match.group(1).decode())
+
+    # 使用 on_bad_lines='skip' 避免文件格式问题中断
+    existing_df = pd.read_csv(file_path, parse_dates=['日期'], on_bad_lines='skip')
+    if existing_df.empty or '日期' not in existing_df.columns:
+        return None
+    return existing_df['日期'].max()
+
 # 保存或增量更新单只股票的历史数据 (并发目标函数)
-def save_and_update_stock_data(stock_code, stock_name, max_retries=5):
+def save_and_update_stock_data(stock_code, stock_name, spot=None, max_retries=5):
     """
     保存或增量更新单只股票的历史数据。
+    spot 为 get_spot_snapshot() 的返回值：本地数据恰好停在上一交易日且快照中有该股票时，
+    直接追加快照中的当日数据，不再请求历史接口。
     返回 True 表示成功或已最新，False 表示失败。
     """
     # FIX 1 (副作用): 由于 get_stock_list 已修正，这里的 stock_code 已经是一个 6 位字符串。
     file_path = os.path.join(DATA_DIR, f"{stock_code}.csv")
     
     start_date_str = "19900101"
-    existing_df = pd.DataFrame()
+    last_date_obj = None
     
-    # --- 尝试读取本地数据，确定增量更新的起始日期 ---
+    # --- 尝试读取本地数据的最后日期，确定增量更新的起始日期 ---
     if os.path.exists(file_path):
         try:
-            # 使用 on_bad_lines='skip' 避免文件格式问题中断
-            existing_df = pd.read_csv(file_path, parse_dates=['日期'], on_bad_lines='skip')
-            existing_df.sort_values(by='日期', inplace=True)
+            last_date_obj = last_csv_date(file_path)
             
-            if not existing_df.empty and '日期' in existing_df.columns:
-                last_date_obj = existing_df['日期'].iloc[-1]
+            if last_date_obj is not None:
                 last_date_str = last_date_obj.strftime('%Y%m%d')
                 today_str = datetime.now().strftime('%Y%m%d')
                 
@@ -99,13 +177,20 @@ def save_and_update_stock_data(stock_code, stock_name, max_retries=5):
                 if last_date_str == today_str:
                     return (True, 0) # 0 表示跳过更新 (已是最新)
 
+                # 只缺当日一根 K 线：直接追加全市场快照中的数据
+                if spot is not None:
+                    _, prev_trade_date, spot_rows = spot
+                    if last_date_obj == prev_trade_date and stock_code in spot_rows:
+                        append_spot_row(file_path, spot_rows[stock_code])
+                        return (True, 1)
+
                 # 设置增量更新的起始日期为本地数据的后一天
                 start_date_obj = last_date_obj + timedelta(days=1)
                 start_date_str = start_date_obj.strftime('%Y%m%d')
 
         except Exception as e:
             # 如果文件读取失败，将尝试全量下载
-            existing_df = pd.DataFrame()
+            last_date_obj = None
             
     # --- 循环尝试下载数据 ---
     for attempt in range(max_retries):
@@ -135,13 +220,13 @@ def save_and_update_stock_data(stock_code, stock_name, max_retries=5):
             
             records_count = 0
             
-            if existing_df.empty:
+            if last_date_obj is None:
                 # 全量下载或文件损坏后重新下载
                 new_data_df.to_csv(file_path, index=False, encoding='utf-8')
                 records_count = len(new_data_df)
             else:
                 # 增量追加数据
-                new_data_df = new_data_df[new_data_df['日期'] > existing_df['日期'].iloc[-1]]
+                new_data_df = new_data_df[new_data_df['日期'] > last_date_obj]
                 
                 if not new_data_df.empty:
                     # 注意：如果 new_data_df 在上面的 insert 步骤中没有 '股票代码' 列，这里会导致列错位。
@@ -251,9 +336,14 @@ def main():
     fail_count = 0
     records_updated = 0
     
+    # 收盘后先获取一次全市场快照，只缺当日数据的股票无需逐只请求
+    spot = get_spot_snapshot()
+    if spot is not None:
+        print(f"已获取 {len(spot[2])} 只股票的当日行情快照。")
+
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         future_to_stock = {
-            executor.submit(save_and_update_stock_data, row['代码'], row['名称']): (row['代码'], row['名称'])
+            executor.submit(save_and_update_stock_data, row['代码'], row['名称'], spot): (row['代码'], row['名称'])
             for _, row in current_batch.iterrows()
         }
         
@@ -295,6 +385,15 @@ def main():
         if os.path.exists(PROGRESS_FILE):
              os.remove(PROGRESS_FILE)
         print("所有股票已分析完毕。进度文件已清除。")
+        # 全部更新完成后重建列式存储，供筛选脚本直接读取
+        try:
+            import build_store
+            build_store.main()
+        except ImportError as e:
+            print(f"未安装 pyarrow，跳过列式存储的生成: {e}")
+        except Exception as e:
+            # 列式存储只是由 CSV 派生的缓存，生成失败不影响本次更新，筛选脚本会在需要时重建
+            print(f"生成列式存储出错，已跳过: {e}")
         # 退出码 0 通知工作流完成
         exit(0)
 
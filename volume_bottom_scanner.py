@@ -1,12 +1,37 @@
 # volume_bottom_scanner.py (最终稳定版本：包含价格上下限和ST/创业板排除)
 
+import csv
+import io
 import os
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-import glob
+from functools import lru_cache
 import time
 
+from stock_io import list_stock_files, read_tail_bytes, stock_codes
+
+# pyarrow 可用时使用其 C++ CSV 解析器读取单个股票文件，否则退回 pd.read_csv
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pacsv = None
+
+# 列式存储的生成依赖 pyarrow，不可用时逐个读取 CSV
+try:
+    import build_store
+except ImportError:
+    build_store = None
+
+# numba 可用时用 JIT 编译的并行内核做批量技术筛选，否则使用 NumPy 向量化实现
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
 # --- 1. 筛选条件配置 ---
 STOCK_DATA_DIR = 'stock_data'
 STOCK_NAMES_FILE = 'stock_names.csv'
@@ -17,170 +42,340 @@ PRICE_LOW_PERIOD = 40    # 低位周期：价格低位确认周期 M
 VOLUME_SHRINK_RATIO = 0.03  # 【沿用】缩量比例：最新成交量 <= 天量的 3% 
 PRICE_LOW_RANGE_RATIO = 0.03 # 【沿用】低位范围：要求最新价在低位周期最低价的 3% 范围内
 
+# 各组筛选参数：数据只读取、解析一次，每组参数在同一批窗口数据上各自筛选并输出一个结果文件
+# (name 为输出文件名前缀)。需要其他价格区间或周期的变体时在此追加一组，不必复制整个脚本
+STRATEGIES = [
+    {
+        'name': 'volume_bottom',
+        'price_min': PRICE_MIN,
+        'price_max': PRICE_MAX,
+        'volume_period': VOLUME_PERIOD,
+        'low_period': PRICE_LOW_PERIOD,
+        'shrink_ratio': VOLUME_SHRINK_RATIO,
+        'range_ratio': PRICE_LOW_RANGE_RATIO,
+    },
+]
+# 筛选用到的最近交易日数 (覆盖所有参数组的周期)
+HISTORY_WINDOW = max(max(s['volume_period'], s['low_period']) for s in STRATEGIES)
+
 # --- 2. 数据列名映射 ---
 DATE_COL = '日期'
 CLOSE_COL = '收盘'
 VOLUME_COL = '成交量'
+# 只读取筛选需要的列 (成交量保持原样解析，输出中保留其整数格式)
+USECOLS = [DATE_COL, CLOSE_COL, VOLUME_COL]
+
+# 只保留深沪主板代码前缀
+VALID_PREFIXES = frozenset(('60', '00'))
+
+# pyarrow 读取参数在模块加载时构造一次，各文件复用
+if pacsv is not None:
+    # 外层已按文件并行，单个文件内不再开线程
+    ARROW_READ_OPTIONS = pacsv.ReadOptions(use_threads=False, block_size=1 << 20)
+    # 日期按字符串、收盘价按 float64 读取，成交量类型自动推断 (保留其整数格式)
+    ARROW_CONVERT_OPTIONS = pacsv.ConvertOptions(
+        include_columns=USECOLS,
+        column_types={DATE_COL: pa.string(), CLOSE_COL: pa.float64()},
+    )
+
+# build_store.py 生成的列式存储，存在且比所有 CSV 都新时代替逐个读取 CSV
+STORE_PATH = os.path.join('stock_store', 'stock_data.parquet')
 
 # --- 3. 股票名称字典 (在主函数中加载) ---
 STOCK_NAMES_DICT = {}
 
+@lru_cache(maxsize=4)
+def _read_stock_names(file_path, mtime):
+    """
+    解析名称文件为 代码 -> 名称 字典，按 (路径, 修改时间) 缓存，文件未变化时不再重复解析。
+    只需构建一个字典，用 csv.reader 逐行读取 (首行为表头，前两列依次为代码和名称)。
+    """
+    with open(file_path, encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return {row[0].strip().zfill(6): row[1] for row in reader if len(row) >= 2}
+
 def load_stock_names():
     """加载股票代码和名称的映射表，适配 'code,name' 标题格式。"""
     global STOCK_NAMES_DICT
     print(f"尝试加载股票名称文件: {STOCK_NAMES_FILE}")
     try:
-        names_df = pd.read_csv(
-            STOCK_NAMES_FILE, 
-            dtype={'code': str} 
-        )
-        names_df.columns = ['Code', 'Name'] 
-        names_df['Code'] = names_df['Code'].astype(str).str.strip().str.zfill(6) 
-        STOCK_NAMES_DICT = names_df.set_index('Code')['Name'].to_dict()
+        STOCK_NAMES_DICT = _read_stock_names(STOCK_NAMES_FILE, os.path.getmtime(STOCK_NAMES_FILE))
         print(f"成功加载 {len(STOCK_NAMES_DICT)} 条股票名称记录。")
         return STOCK_NAMES_DICT
     except Exception as e:
         print(f"Error loading stock names: {e}")
         return {}
 
-def analyze_stock_file(file_path):
-    """分析单个股票的CSV文件，应用所有筛选条件。"""
-    
-    code = os.path.basename(file_path).split('.')[0].zfill(6)
-    name = STOCK_NAMES_DICT.get(code, '未知名称')
-    
-    # --- A. 基本面/交易规则排除 ---
-    # 1. 排除创业板 (30开头)
-    if code.startswith('30'):
-        # print(f"排除 {code} ({name}): 创业板股票 (30开头)")
+def parse_stock_tail(buf):
+    """
+    从 read_tail_bytes 返回的字节中解析筛选需要的列，直接返回 (日期, 收盘价, 成交量) 三个 NumPy 数组，
+    不构建 DataFrame (日期按字符串、收盘价按 float64，成交量类型自动推断)。
+    """
+    if pacsv is None:
+        df = pd.read_csv(io.BytesIO(buf), usecols=USECOLS, dtype={CLOSE_COL: 'float64'}, engine='c')
+        return tuple(df[col].to_numpy() for col in USECOLS)
+
+    table = pacsv.read_csv(pa.BufferReader(buf), read_options=ARROW_READ_OPTIONS,
+                           convert_options=ARROW_CONVERT_OPTIONS)
+    return tuple(table.column(col).to_numpy() for col in USECOLS)
+
+def sort_by_date(dates, closes, volumes):
+    """update.py 按日期升序追加写入，通常已有序；只有检测到乱序时才按日期排序"""
+    if len(dates) > 1 and not (dates[:-1] <= dates[1:]).all():
+        order = np.argsort(dates, kind='stable')
+        return dates[order], closes[order], volumes[order]
+    return dates, closes, volumes
+
+def load_store_windows(stock_files):
+    """
+    列式存储可用且不早于任何一个 CSV 文件时，一次性取出所有股票最近 HISTORY_WINDOW 天的数据，
+    stock_files 为 [(CSV 路径, 修改时间)]。
+    返回 (代码列表, 收盘价二维数组, 成交量数组列表)，收盘价形状为 (股票数, HISTORY_WINDOW)，按日期升序；
+    存储缺失或过期时先重新生成一次 (缓存解析结果，之后的扫描直接读取)；
+    数据不足 HISTORY_WINDOW 天的股票不包含在内。存储不可用时返回 None，由调用方逐个读取 CSV。
+    """
+    if build_store is None or not build_store.ensure_store(stock_files):
         return None
-        
-    # 2. 排除 ST/PT 股
-    if 'ST' in name or 'PT' in name or '*' in name:
-        # print(f"排除 {code} ({name}): ST/PT 或带 * 股票")
+    try:
+        # 只取当前仍有 CSV 文件的股票，已删除的文件残留在存储中的行不参与筛选
+        df = pd.read_parquet(STORE_PATH, columns=['code'] + USECOLS,
+                             filters=[('code', 'in', stock_codes(stock_files))])
+    except ImportError:
         return None
-    
-    # 3. 排除深沪A股以外的代码 (主要排除科创板/创业板以外的 B/H/CDR 等，但前面已排除了创业板)
-    # 此处假设您的 stock_data 文件夹中只包含 A 股代码，主要排除逻辑放在代码前缀和名称上。
-    # 补充：只保留 60, 00, 30 开头，由于 30 已排除，此处主要检查 60/00/688
-    if not (code.startswith('60') or code.startswith('00')):
+
+    # 存储中同一股票的行按日期升序连续存放：由代码变化的位置得到每只股票的末行，
+    # 再用一个 (股票数, HISTORY_WINDOW) 的下标矩阵从整列数组中一次性取出所有窗口，不逐只股票循环
+    codes = df['code'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)]
+    enough = (ends - starts) >= HISTORY_WINDOW
+    window_index = ends[enough, None] - HISTORY_WINDOW + np.arange(HISTORY_WINDOW)
+    volumes2d = df[VOLUME_COL].to_numpy()[window_index]
+    # 成交量在存储中为 float64：逐只股票判断，窗口内全为整数时还原为整数，
+    # 与读取 CSV 时逐文件推断的类型一致，个别股票的小数/缺失值不影响其他股票的输出格式
+    integral = (volumes2d % 1 == 0).all(axis=1)
+    return ([code.zfill(6) for code in codes[starts[enough]]],
+            df[CLOSE_COL].to_numpy()[window_index],
+            [row.astype(np.int64) if ok else row for row, ok in zip(volumes2d, integral)])
+
+def is_candidate(code, name):
+    """基本面/交易规则排除：返回 True 表示保留"""
+    # 1. 只保留深沪主板 (60/00 开头)，创业板 (30开头) 等其余代码已被排除
+    if code[:2] not in VALID_PREFIXES:
         # print(f"排除 {code} ({name}): 非深沪A股主要代码")
-        return None
+        return False
 
+    # 2. 排除 ST/PT 股
+    if 'ST' in name or 'PT' in name or '*' in name:
+        # print(f"排除 {code} ({name}): ST/PT 或带 * 股票")
+        return False
+    return True
 
-    # --- B. 数据加载和技术筛选 ---
+def load_recent_history(file_path):
+    """
+    读取并解析单个股票文件的尾部 (在子进程中调用)，返回最近 HISTORY_WINDOW 天的 (closes, volumes) 数组；
+    读取失败、格式错误或数据不足时返回 None。代码/名称排除已在主进程完成。
+    筛选只用到最近 HISTORY_WINDOW 天，只读取文件尾部，不再读取整个历史。
+    """
     try:
-        df = pd.read_csv(file_path)
-        df = df.sort_values(by=DATE_COL).reset_index(drop=True)
+        dates, closes, volumes = parse_stock_tail(read_tail_bytes(file_path, HISTORY_WINDOW))
         
-        if len(df) < max(VOLUME_PERIOD, PRICE_LOW_PERIOD):
+        if len(dates) < HISTORY_WINDOW:
             return None
+        dates, closes, volumes = sort_by_date(dates, closes, volumes)
 
-        latest_data = df.iloc[-1]
-        latest_close = latest_data[CLOSE_COL]
-        latest_volume = latest_data[VOLUME_COL]
-        
-        # 4. 价格上下限筛选
-        if not (PRICE_MIN <= latest_close <= PRICE_MAX):
-            # print(f"排除 {code} ({name}): 价格 {latest_close} 不在 [{PRICE_MIN}, {PRICE_MAX}] 范围内")
-            return None
+        # 只取最近 HISTORY_WINDOW 天的收盘价和成交量
+        return closes[-HISTORY_WINDOW:], volumes[-HISTORY_WINDOW:]
 
-        # 5. 缩量条件: 最新成交量 <= 120 天天量的 5%
-        history_df = df.iloc[-max(VOLUME_PERIOD, PRICE_LOW_PERIOD):]
-        max_volume = history_df[VOLUME_COL].iloc[-VOLUME_PERIOD:].max()
-        
-        if latest_volume > max_volume * VOLUME_SHRINK_RATIO:
-            return None
-        
-        # 6. 价格低位确认: 最新价处于过去 40 天的最低 5% 范围内
-        price_history = history_df[CLOSE_COL].iloc[-PRICE_LOW_PERIOD:]
-        low_price = price_history.min()
-        high_price = price_history.max()
-        price_range = high_price - low_price
-        
-        low_threshold = low_price + PRICE_LOW_RANGE_RATIO * price_range
-        
-        if latest_close > low_threshold:
-            return None
-
-        # 所有条件满足
-        return {
-            'Code': code,
-            'Name': name, 
-            'Latest_Close': latest_close,
-            'Latest_Volume': latest_volume,
-            'Max_Volume_120d': max_volume,
-            'Low_Price_40d_Threshold': low_threshold
-        }
-
-    except KeyError as e:
-        print(f"Error: File {file_path} is missing expected column: {e}. Check your data format.")
-        return None
     except Exception as e:
-        # print(f"Error processing file {file_path}: {e}")
+        # print(f"Error parsing stock data: {e}")
         return None
 
-def main():
-    """主函数，管理并行处理和结果输出。"""
-    print(f"--- 启动缩量见底扫描 (价格 [{PRICE_MIN}, {PRICE_MAX}]，缩量 <= {VOLUME_SHRINK_RATIO*100}%，低位 <= {PRICE_LOW_RANGE_RATIO*100}%) ---")
-    
-    if not os.path.isdir(STOCK_DATA_DIR):
-        print(f"Error: Directory '{STOCK_DATA_DIR}' not found.")
-        return
+def load_csv_windows(candidates):
+    """
+    逐个读取 CSV 得到候选股票的窗口数据，candidates 为 {code: (文件路径, 名称)}。
+    子进程读取并解析文件尾部，返回 (代码列表, 名称列表, closes 列表, volumes 列表)。
+    """
+    candidate_codes = list(candidates)
+    workers = os.cpu_count() or 4
+    # 按块分发任务以摊薄进程间通信开销
+    chunksize = max(1, len(candidate_codes) // (workers * 4))
+    print(f"使用 {workers} 个工作进程并行扫描 {len(candidate_codes)} 个文件...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        paths = [candidates[code][0] for code in candidate_codes]
+        loaded = [(code, candidates[code][1]) + r
+                  for code, r in zip(candidate_codes, executor.map(load_recent_history, paths, chunksize=chunksize))
+                  if r is not None]
+    return tuple(zip(*loaded)) if loaded else ((), (), (), ())
 
-    all_files = glob.glob(os.path.join(STOCK_DATA_DIR, '*.csv'))
-    if not all_files:
-        print(f"Error: No CSV files found in {STOCK_DATA_DIR}")
-        return
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True)
+    def _volume_bottoms_njit(closes, volumes, price_min, price_max, volume_period,
+                             low_period, shrink_ratio, range_ratio):
+        """
+        find_volume_bottoms 的 numba 版本：逐只股票按 价格 -> 缩量 -> 低位 的顺序判断，
+        前一条件不满足时不再扫描后面的窗口 (未入选股票的低位阈值为 NaN，调用方只使用入选股票的阈值)。
+        最值计算与 np.nanmax / np.nanmin 一致，忽略缺失值。
+        """
+        n, window = closes.shape
+        matched = np.zeros(n, dtype=np.bool_)
+        low_threshold = np.full(n, np.nan)
+        for i in prange(n):
+            latest_close = closes[i, window - 1]
+            if not (latest_close >= price_min and latest_close <= price_max):
+                continue
 
-    # 预加载股票名称字典
-    load_stock_names()
+            max_volume = np.nan
+            for k in range(window - volume_period, window):
+                v = volumes[i, k]
+                if not np.isnan(v) and (np.isnan(max_volume) or v > max_volume):
+                    max_volume = v
+            if volumes[i, window - 1] > max_volume * shrink_ratio:
+                continue
+
+            low_price = np.nan
+            high_price = np.nan
+            for k in range(window - low_period, window):
+                c = closes[i, k]
+                if not np.isnan(c):
+                    if np.isnan(low_price) or c < low_price:
+                        low_price = c
+                    if np.isnan(high_price) or c > high_price:
+                        high_price = c
+            threshold = low_price + range_ratio * (high_price - low_price)
+            low_threshold[i] = threshold
+            matched[i] = not (latest_close > threshold)
+        return matched, low_threshold
+
+def find_volume_bottoms(closes, volumes, strategy):
+    """
+    按 strategy (STRATEGIES 中的一组参数) 对全部股票一次性做技术筛选。
+    closes / volumes 形状为 (股票数, HISTORY_WINDOW)，按日期升序。
+    返回 (是否入选的布尔数组, 低位周期阈值)。
+    """
+    price_min, price_max = strategy['price_min'], strategy['price_max']
+    volume_period, low_period = strategy['volume_period'], strategy['low_period']
+    shrink_ratio, range_ratio = strategy['shrink_ratio'], strategy['range_ratio']
+    if HAS_NUMBA:
+        return _volume_bottoms_njit(np.ascontiguousarray(closes, dtype=np.float64),
+                                    np.ascontiguousarray(volumes, dtype=np.float64),
+                                    price_min, price_max, volume_period, low_period,
+                                    shrink_ratio, range_ratio)
+
+    # 按 价格 -> 缩量 -> 低位 的顺序逐步缩小候选集合，后面的归约只在前面条件的幸存者上计算
+    # (未入选股票的低位阈值为 NaN，调用方只使用入选股票的阈值)
+    matched = np.zeros(len(closes), dtype=bool)
+    low_threshold = np.full(len(closes), np.nan)
+    latest_close = closes[:, -1]
+
+    # 4. 价格上下限筛选：单个标量比较，最廉价，先做
+    idx = np.flatnonzero((latest_close >= price_min) & (latest_close <= price_max))
+
+    # 5. 缩量条件: 最新成交量 <= 缩量周期内天量的一定比例 (与 pandas 的 max 一样忽略缺失值)
+    max_volume = np.nanmax(volumes[idx, -volume_period:], axis=1)
+    idx = idx[~(volumes[idx, -1] > max_volume * shrink_ratio)]
+
+    # 6. 价格低位确认: 最新价处于低位周期价格区间的底部范围内
+    price_history = closes[idx, -low_period:]
+    low_price = np.nanmin(price_history, axis=1)
+    high_price = np.nanmax(price_history, axis=1)
+    low_threshold[idx] = low_price + range_ratio * (high_price - low_price)
+    matched[idx] = ~(latest_close[idx] > low_threshold[idx])
+
+    return matched, low_threshold
+
+def load_candidate_windows(stock_files, candidates, use_store=True):
+    """
+    返回候选股票的 (代码列表, 名称列表, closes, volumes)，candidates 为 {code: (文件路径, 名称)}。
+    列式存储可用 (安装了 pyarrow) 时总是从 build_store.py 生成的存储读取；
+    逐个读取 CSV 的 load_csv_windows
+    只是存储不可用时的后备路径。use_store=False 时强制走后备路径，用于与存储结果做对照测试。
+    """
+    store_windows = load_store_windows(stock_files) if use_store else None
+    if store_windows is None:
+        return load_csv_windows(candidates)
+
+    # 数据已全部在内存中，只需挑出候选股票的行
+    print(f"从 {STORE_PATH} 读取行情数据。")
+    store_codes, store_closes, store_volumes = store_windows
+    selected = [i for i, code in enumerate(store_codes) if code in candidates]
+    codes = [store_codes[i] for i in selected]
+    return (codes, [candidates[code][1] for code in codes],
+            store_closes[selected], [store_volumes[i] for i in selected])
+
+def save_strategy_results(strategy, codes, names, closes, volumes, closes2d, volumes2d, current_time):
+    """按一组筛选参数在已加载的窗口数据上筛选，输出该组的结果文件"""
+    volume_period = strategy['volume_period']
+    print(f"\n--- 筛选 {strategy['name']} (价格 [{strategy['price_min']}, {strategy['price_max']}]，"
+          f"缩量 <= {strategy['shrink_ratio']*100}%，低位 <= {strategy['range_ratio']*100}%) ---")
+
+    # 结果按 output_columns 顺序组成元组，最后一次性构建 DataFrame
+    output_columns = ['Code', 'Name', 'Latest_Close', 'Latest_Volume',
+                      f'Max_Volume_{volume_period}d', f"Low_Price_{strategy['low_period']}d_Threshold"]
     results = []
-    
-    workers = os.cpu_count() * 2 if os.cpu_count() else 4
-    print(f"使用 {workers} 个工作线程并行扫描 {len(all_files)} 个文件...")
-    
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        # 确保只将沪深A股代码文件放入线程池（基于文件名）
-        # 这一步是为了避免对非A股/非标代码进行耗时的数据读取和分析
-        filtered_files = [
-            f for f in all_files 
-            if os.path.basename(f).split('.')[0].zfill(6).startswith(('60', '00'))
-        ]
-        
-        future_to_file = {executor.submit(analyze_stock_file, file_path): file_path for file_path in filtered_files}
-        
-        for future in as_completed(future_to_file):
-            result = future.result()
-            if result:
-                results.append(result)
-            
-    
-    current_time = datetime.now()
+    if len(codes):
+        matched, low_thresholds = find_volume_bottoms(closes2d, volumes2d, strategy)
+        # 成交量从各股票原始数组取值，保持其原有类型 (通常为整数)
+        results = [(codes[i], names[i], closes[i][-1], volumes[i][-1],
+                    np.nanmax(volumes[i][-volume_period:]), low_thresholds[i])
+                   for i in np.flatnonzero(matched)]
+
     output_dir = current_time.strftime('output/%Y/%m')
     os.makedirs(output_dir, exist_ok=True)
     timestamp = current_time.strftime('%Y%m%d_%H%M%S')
-    final_output_path = os.path.join(output_dir, f'volume_bottom_scan_results_{timestamp}.csv')
-
-    output_columns = ['Code', 'Name', 'Latest_Close', 'Latest_Volume', 'Max_Volume_120d', 'Low_Price_40d_Threshold']
+    final_output_path = os.path.join(output_dir, f"{strategy['name']}_scan_results_{timestamp}.csv")
 
     if not results:
-        print("\n扫描完成：没有股票满足筛选条件。")
+        print("扫描完成：没有股票满足筛选条件。")
         pd.DataFrame(columns=output_columns).to_csv(final_output_path, index=False)
         print(f"已创建空结果文件: {final_output_path}")
         return
 
-    results_df = pd.DataFrame(results)
-    
-    # 结果的名称匹配和排序
-    results_df = results_df[output_columns]
+    results_df = pd.DataFrame(results, columns=output_columns)
     results_df.to_csv(final_output_path, index=False, encoding='utf-8-sig')
 
-    print("\n--- 筛选结果 ---")
     print(results_df.to_string(index=False))
     print(f"\n扫描完成，共找到 {len(results_df)} 只满足条件的股票。")
     print(f"结果已保存到: {final_output_path}")
 
+def main():
+    """主函数，管理并行处理和结果输出。"""
+    print(f"--- 启动缩量见底扫描 ({len(STRATEGIES)} 组筛选参数) ---")
+    
+    if not os.path.isdir(STOCK_DATA_DIR):
+        print(f"Error: Directory '{STOCK_DATA_DIR}' not found.")
+        return
+
+    # 修改时间与路径一同取得，供列式存储的新鲜度检查使用
+    stock_files = list_stock_files(STOCK_DATA_DIR)
+    all_files = [path for path, _ in stock_files]
+    if not all_files:
+        print(f"Error: No CSV files found in {STOCK_DATA_DIR}")
+        return
+
+    # 预加载股票名称字典
+    load_stock_names()
+    
+    # 先在主进程中按代码/名称做排除 (基于文件名)，
+    # 避免对非A股/非标代码和 ST 股进行耗时的数据读取和分析
+    candidates = {}
+    for f in all_files:
+        code = os.path.basename(f).split('.')[0].zfill(6)
+        name = STOCK_NAMES_DICT.get(code, '未知名称')
+        if is_candidate(code, name):
+            candidates[code] = (f, name)
+
+    # 读取部分只负责得到各股票最近 HISTORY_WINDOW 天的数据，技术筛选在其上一次完成
+    codes, names, closes, volumes = load_candidate_windows(stock_files, candidates)
+
+    # 所有参数组共用同一批窗口数据，只读取、解析一次
+    current_time = datetime.now()
+    closes2d = np.stack(closes).astype(np.float64) if len(codes) else None
+    volumes2d = np.stack(volumes).astype(np.float64) if len(codes) else None
+    for strategy in STRATEGIES:
+        save_strategy_results(strategy, codes, names, closes, volumes, closes2d, volumes2d, current_time)
+
 if __name__ == '__main__':
     # 增加全局字典声明
     STOCK_NAMES_DICT = {}